@@ -1,9 +1,19 @@
+import asyncio
+import json
+from typing import Optional
+
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import Response, StreamingResponse
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 
 from app.db.session import get_db
-from app.services.question_service import list_questions_for_document, trigger_generate_questions
+from app.models.document import Document
+from app.services.question_service import get_question_set
+from app.services.generation_jobs import start_generation_job, get_job
+
+SSE_POLL_SECONDS = 0.1
+SSE_KEEPALIVE_SECONDS = 15
 
 router = APIRouter()
 
@@ -13,35 +23,78 @@ class GenerateRequest(BaseModel):
     n_match: int = 5
     n_short: int = 5
     regenerate: bool = False
+    topic: Optional[str] = None  # focus generation on chunks about this topic
 
 @router.get("/{document_id}")
 def list_questions(document_id: str, db: Session = Depends(get_db)):
     """
     Return list of questions (existing + generated) for a document.
     """
-    questions = list_questions_for_document(db, document_id)
-    return {"document_id": document_id, "questions": questions}
+    # the cached set carries its questions pre-encoded, so hot documents skip serialisation
+    question_set = get_question_set(db, document_id)
+    body = b'{"document_id": ' + json.dumps(document_id).encode("utf-8") + b', "questions": ' + question_set.json + b"}"
+    return Response(content=body, media_type="application/json")
 
 @router.post("/generate")
 def generate_questions_endpoint(payload: GenerateRequest, db: Session = Depends(get_db)):
     """
-    Trigger generation of new questions for a document.
-    """
-    try:
-        success = trigger_generate_questions(
-            db=db,
-            document_id=payload.document_id,
-            n_mcq=payload.n_mcq,
-            n_match=payload.n_match,
-            n_short=payload.n_short,
-            regenerate=payload.regenerate,
-        )
-        if not success:
-            raise HTTPException(status_code=500, detail="Question generation failed")
-        return {"status": "started", "document_id": payload.document_id}
-    
-    except Exception as e:
-        print(f"DEBUG: Exception in generate_questions: {e}")
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+    Start a background generation job for a document and return its ID.
+    Poll /questions/jobs/{job_id} or stream /questions/jobs/{job_id}/stream.
+    """
+    if not db.query(Document.id).filter(Document.id == payload.document_id).first():
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    job = start_generation_job(
+        payload.document_id,
+        n_mcq=payload.n_mcq,
+        n_match=payload.n_match,
+        n_short=payload.n_short,
+        regenerate=payload.regenerate,
+        topic=payload.topic,
+    )
+    return {"status": "started", "document_id": payload.document_id, "job_id": job.id}
+
+@router.get("/jobs/{job_id}")
+def generation_job_status(job_id: str):
+    """
+    Return the status of a generation job.
+    """
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@router.get("/jobs/{job_id}/stream")
+async def stream_generation_job(job_id: str):
+    """
+    Server-Sent Events: a `questions` event per saved batch, `status` events on
+    state changes, and a final `done` event.
+    """
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        cursor = 0
+        idle = 0.0
+        while True:
+            pending = job.events_since(cursor)
+            cursor += len(pending)
+            for event, data in pending:
+                yield _sse(event, data)
+            if pending:
+                idle = 0.0
+            if job.finished and not job.events_since(cursor):
+                yield _sse("done", job.to_dict())
+                return
+            await asyncio.sleep(SSE_POLL_SECONDS)
+            idle += SSE_POLL_SECONDS
+            if idle >= SSE_KEEPALIVE_SECONDS:
+                idle = 0.0
+                yield ": keepalive\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -1,10 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 
 from app.db.session import get_db
-from app.services.quiz_service import get_next_question_for_user, grade_answer_and_update_progress
+from app.services.quiz_service import (
+    get_next_question_for_user,
+    grade_answer_and_update_progress,
+    grade_answers_and_update_progress,
+)
 
 
 router = APIRouter()
@@ -17,6 +21,18 @@ class AnswerPayload(BaseModel):
     answer: Dict
     elapsed_seconds: Optional[int] = None
 
+
+class BatchAnswerItem(BaseModel):
+    question_id: str
+    answer: Dict
+    elapsed_seconds: Optional[int] = None
+
+
+class BatchAnswerPayload(BaseModel):
+    user_id: str
+    document_id: str
+    answers: List[BatchAnswerItem]
+
 import uuid
 from fastapi import HTTPException
 
@@ -47,3 +63,17 @@ def submit_answer(payload: AnswerPayload, db: Session = Depends(get_db)):
     if not result.get("success", False):
         raise HTTPException(status_code=404, detail=result.get("message", "Unknown error"))
     return result
+
+
+@router.post("/answers")
+def submit_answers(payload: BatchAnswerPayload, db: Session = Depends(get_db)):
+    """
+    Grade a whole submitted quiz in one transaction. Unknown questions are
+    reported per item instead of failing the batch.
+    """
+    return grade_answers_and_update_progress(
+        db,
+        payload.user_id,
+        payload.document_id,
+        [item.model_dump() for item in payload.answers],
+    )
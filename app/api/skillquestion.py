@@ -1,37 +1,69 @@
+import asyncio
 import fitz  # PyMuPDF
-import google.generativeai as genai
 import logging
-import json
+import math
 import re
+import time
+
+import anyio
 from fastapi import UploadFile, APIRouter, Depends
 from sqlalchemy.orm import Session
-from google.api_core.exceptions import ResourceExhausted
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.config.settings import settings
-from app.db.session import get_db
-from app.models.question import Question
+from app.db.session import get_async_db
+from app.services.question_writer import bulk_insert_questions
+from app.services.llm_providers import RateLimitError, get_provider
+from app.services.json_stream import parse_json_objects
+from app.services.llm_client import TOKENS_PER_CHAR, count_tokens, split_quota
+from app.services.metrics import observe_llm_call
 
 logging.basicConfig(level=logging.DEBUG)
-genai.configure(api_key=settings.gemini_api_key)
 MODEL_NAME = "gemini-2.5-pro"
+SECTION_MAX_TOKENS = 8_000    # document tokens per map prompt
+SECTION_OVERSAMPLE = 1.25     # extra questions requested so de-duplication can still fill the counts
 
 router = APIRouter()
 
 
 # --- PDF Text Extraction ---
+def _extract_text(file_bytes: bytes) -> str:
+    with fitz.open(stream=file_bytes, filetype="pdf") as doc:
+        return "\n".join(page.get_text() for page in doc)
+
+
 async def extract_text_from_pdf(file: UploadFile) -> str:
     """
-    Extract text from a PDF file (UploadFile.file object)
+    Extract text from a PDF file (UploadFile.file object).
+    Parsing is CPU-bound, so it runs in a worker thread off the event loop.
     """
     file_bytes = await file.read()
-    doc = fitz.open(stream=file_bytes, filetype="pdf")
-    text = ""
-    for page in doc:
-        text += page.get_text()
-    return text
+    return await anyio.to_thread.run_sync(_extract_text, file_bytes)
+
+
+# --- Sectioning ---
+def split_sections(text: str, max_tokens: int = SECTION_MAX_TOKENS) -> list[str]:
+    """
+    Split document text into consecutive sections of at most `max_tokens`
+    (estimated), breaking on paragraph/line boundaries where possible.
+    """
+    max_chars = int(max_tokens / TOKENS_PER_CHAR)
+    sections, current, size = [], [], 0
+    for block in text.split("\n"):
+        # a single oversized line is hard-split
+        pieces = [block[i:i + max_chars] for i in range(0, len(block), max_chars)] or [""]
+        for piece in pieces:
+            if current and size + len(piece) + 1 > max_chars:
+                sections.append("\n".join(current))
+                current, size = [], 0
+            current.append(piece)
+            size += len(piece) + 1
+    if current:
+        sections.append("\n".join(current))
+    return [sec for sec in sections if sec.strip()]
 
 
 # --- Gemini Question Generation ---
-def generate_questions_from_text(text: str) -> list[dict]:
+def generate_questions_from_text(text: str, n_mcq: int = 5, n_short: int = 3) -> list[dict]:
     """
     Generate MCQs + short answer questions using Gemini API.
     Returns a Python list of question dictionaries.
@@ -41,77 +73,155 @@ You are an intelligent question generator. You must generate questions strictly
 Do NOT invent information. Only extract concepts, facts, or statements from the content to create the questions.
 
 Instructions:
-1. Generate exactly 5 multiple choice questions (MCQs) and 3 short answer questions.
+1. Generate exactly {n_mcq} multiple choice questions (MCQs) and {n_short} short answer questions.
 2. For MCQs:
    - Provide 4 options labeled A), B), C), D)
    - Clearly indicate the correct option in the "answer" field
    - Questions must be clear, concise, and answerable using the document content only
 3. For short answer questions:
    - Provide a concise answer that is fully contained in the document content
-4. Return ONLY a JSON array with no extra text or explanation
+4. Each question is an object with "type" ("mcq" or "short"), "question", "options" (MCQs only) and "answer"
+5. Return ONLY a JSON array with no extra text or explanation
 
 Document Content:
 {text}
 
-Return a JSON array of exactly 8 questions.
+Return a JSON array of exactly {n_mcq + n_short} questions.
 """
 
-    model = genai.GenerativeModel(MODEL_NAME)
+    provider = get_provider()
+    started = time.perf_counter()
     try:
-        response = model.generate_content(prompt)
-        raw_text = response.text
-        logging.debug(f"Raw Gemini response: {raw_text[:500]}")  # log first 500 chars
+        raw_text = provider.generate(prompt, MODEL_NAME)
+        observe_llm_call(provider.name, "ok", time.perf_counter() - started,
+                         count_tokens(prompt), count_tokens(raw_text))
+        logging.debug(f"Raw model response: {raw_text[:500]}")  # log first 500 chars
 
-        # Attempt to parse JSON safely
-        match = re.search(r'(\[.*\])', raw_text, re.DOTALL)
-        if match:
-            questions = json.loads(match.group(1))
-            if isinstance(questions, list):
-                return questions
+        # Parse object by object so one malformed element doesn't lose the rest
+        questions = parse_json_objects(raw_text)
+        if questions:
+            return questions
 
         logging.error("Failed to parse questions JSON from Gemini response.")
         return []
 
-    except ResourceExhausted:
-        logging.error("Gemini API quota exceeded.")
+    except RateLimitError:
+        observe_llm_call(provider.name, "rate_limited", time.perf_counter() - started, count_tokens(prompt))
+        logging.error("LLM API quota exceeded.")
         return []
     except Exception as e:
+        observe_llm_call(provider.name, "error", time.perf_counter() - started, count_tokens(prompt))
         logging.error(f"Unexpected error from Gemini API: {e}")
         return []
 
 
+def _question_type(q: dict) -> str:
+    q_type = str(q.get("type") or "").lower()
+    if q_type in ("mcq", "short"):
+        return q_type
+    return "mcq" if q.get("options") else "short"
+
+
+def _spread_pick(per_section: list[list[dict]], n: int) -> list[dict]:
+    """
+    Up to `n` questions taken round by round (each section's first, then its
+    second, ...); when only part of a round fits, its picks are spaced evenly
+    across the sections. Returned in document order.
+    """
+    chosen = []
+    for round_ in range(max((len(qs) for qs in per_section), default=0)):
+        candidates = [(i, round_) for i, qs in enumerate(per_section) if round_ < len(qs)]
+        room = n - len(chosen)
+        if len(candidates) > room:
+            candidates = [candidates[int((j + 0.5) * len(candidates) / room)] for j in range(room)]
+        chosen.extend(candidates)
+        if len(chosen) >= n:
+            break
+    return [per_section[i][r] for i, r in sorted(chosen)]
+
+
+def merge_questions(partials: list[list[dict]], n_mcq: int, n_short: int) -> list[dict]:
+    """
+    Reduce step: drop near-identical questions (keeping the first in document
+    order), then trim to the requested counts per type with `_spread_pick`,
+    so every part of the document keeps its share.
+    """
+    seen = set()
+    mcqs, shorts = [], []
+    for questions in partials:
+        mcqs.append([])
+        shorts.append([])
+        for q in questions:
+            if not isinstance(q, dict) or not q.get("question"):
+                continue
+            key = " ".join(re.findall(r"[a-z0-9]+", str(q["question"]).lower()))
+            if key in seen:
+                continue
+            seen.add(key)
+            q = {**q, "type": _question_type(q)}
+            (mcqs if q["type"] == "mcq" else shorts)[-1].append(q)
+    return _spread_pick(mcqs, n_mcq) + _spread_pick(shorts, n_short)
+
+
+async def generate_questions_map_reduce(text: str, n_mcq: int = 5, n_short: int = 3) -> list[dict]:
+    """
+    Map: one prompt per token-budgeted section, run concurrently (bounded by
+    `settings.llm_max_concurrency`) in worker threads. Each section asks for
+    its size-proportional share of the counts, slightly oversampled so
+    de-duplication can still fill the request; with more sections than
+    questions the shares land evenly along the document. Reduce:
+    `merge_questions`.
+    """
+    sections = split_sections(text)
+    if not sections:
+        return []
+    weights = [len(sec) for sec in sections]
+    mcq_quota = split_quota(math.ceil(n_mcq * SECTION_OVERSAMPLE), weights)
+    short_quota = split_quota(math.ceil(n_short * SECTION_OVERSAMPLE), weights)
+    logging.debug(f"Generating from {len(sections)} sections")
+
+    limiter = asyncio.Semaphore(max(1, settings.llm_max_concurrency))
+
+    async def run_section(section: str, m: int, s: int) -> list[dict]:
+        if m == s == 0:
+            return []
+        async with limiter:
+            return await anyio.to_thread.run_sync(generate_questions_from_text, section, m, s)
+
+    partials = await asyncio.gather(*(
+        run_section(sec, m, s) for sec, m, s in zip(sections, mcq_quota, short_quota)
+    ))
+    return merge_questions(partials, n_mcq, n_short)
+
+
 # --- Save Questions to Database ---
 def save_questions_to_db(questions: list[dict], db: Session, document_id: str):
-    for q in questions:
-        question_obj = Question(
-            document_id=document_id,
-            question_type=q.get("type"),          
-            question_text=q.get("question"),       
-            options=q.get("options") if q.get("options") else None,
-            answer=q.get("answer")
-        )
-        db.add(question_obj)
-    db.commit()
+    return bulk_insert_questions(db, document_id, questions)
 
 
 
 # --- FastAPI Endpoint ---
 @router.post("/skillquestion-generate")
-async def upload_pdf(file: UploadFile, db: Session = Depends(get_db)):
+async def upload_pdf(
+    file: UploadFile,
+    n_mcq: int = 5,
+    n_short: int = 3,
+    db: AsyncSession = Depends(get_async_db),
+):
     try:
         text = await extract_text_from_pdf(file)
         if not text.strip():
             return {"detail": "Uploaded PDF is empty or contains no extractable text."}
 
-        questions = generate_questions_from_text(text)
+        questions = await generate_questions_map_reduce(text, n_mcq, n_short)
         if not questions:
             return {"detail": "Failed to generate questions from the document."}
 
         document_id = "some-document-id"  # Replace with Goal ID logic
         
-        save_questions_to_db(questions, db, document_id)
+        saved, rejected = await db.run_sync(lambda session: save_questions_to_db(questions, session, document_id))
 
-        return {"detail": f"{len(questions)} questions saved successfully."}
+        return {"detail": f"{len(saved)} questions saved successfully.", "rejected": rejected}
 
     except Exception as e:
         logging.error(f"Error in upload_pdf endpoint: {e}")
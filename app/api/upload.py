@@ -1,44 +1,166 @@
+import hashlib
 import uuid
 from pathlib import Path
-from fastapi import APIRouter, UploadFile, File, Depends, BackgroundTasks, HTTPException
+from typing import Tuple
+
+import anyio
+from fastapi import APIRouter, Request, Depends, HTTPException
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from python_multipart.multipart import MultipartParser, parse_options_header
+from python_multipart.exceptions import MultipartParseError
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 
-from app.db.session import get_db
+from app.db.session import get_async_db
 from app.models.document import Document
-from app.tasks.ingestion import start_ingestion_for_document
+from app.services.document_service import find_indexed_by_hash, create_alias
+from app.services.progress_service import get_progress_for_document
+from app.tasks.ingestion import enqueue_ingestion
 from app.config.settings import settings
 
 UPLOAD_DIR = Path(settings.upload_dir)
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
+MULTIPART_OVERHEAD = 64 * 1024  # boundaries and part headers allowed on top of max_file_size
+UPLOAD_REQUEST_BODY = {
+    "required": True,
+    "content": {"multipart/form-data": {"schema": {
+        "type": "object", "required": ["file"], "properties": {"file": {"type": "string", "format": "binary"}},
+    }}},
+}
+
 router = APIRouter()
 
 DUMMY_USER_ID = "dummy-user-1"
 
-@router.post("/")
-async def upload_pdf(background_tasks: BackgroundTasks, file: UploadFile = File(...), db: Session = Depends(get_db)):
 
-    if not file.filename.lower().endswith(".pdf"):
-        return HTTPException(status_code=400, detail="Only PDF files are allowed")
-    
-    content = await file.read()
-    if not content:
-        raise HTTPException(status_code=400, detail="Empty file uploaded.")
-    
+def _too_large() -> HTTPException:
+    return HTTPException(status_code=413, detail=f"File exceeds the {settings.max_file_size} byte limit.")
+
+
+async def _stream_to_disk(request: Request, dest_path: Path) -> Tuple[str, int, str]:
+    """
+    Parse the multipart body as it arrives and copy the `file` part to
+    `dest_path` with async file I/O, hashing as it goes. Nothing is spooled
+    first: an oversized upload is refused from its Content-Length, or with 413
+    as soon as the received bytes pass `settings.max_file_size` (the partial
+    file is removed). Returns (filename, size, sha256 hex).
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or not params.get(b"boundary"):
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload")
+    body_limit = settings.max_file_size + MULTIPART_OVERHEAD
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > body_limit:
+        raise _too_large()
+
+    part = {"headers": {}, "field": [], "value": [], "is_file": False}
+    file_info = {"filename": None}
+    received_pieces = []
+
+    def on_part_begin():
+        part["headers"] = {}
+
+    def on_header_field(data, start, end):
+        part["field"].append(data[start:end])
+
+    def on_header_value(data, start, end):
+        part["value"].append(data[start:end])
+
+    def on_header_end():
+        part["headers"][b"".join(part["field"]).lower()] = b"".join(part["value"])
+        part["field"], part["value"] = [], []
+
+    def on_headers_finished():
+        _, options = parse_options_header(part["headers"].get(b"content-disposition", b""))
+        part["is_file"] = options.get(b"name") == b"file" and file_info["filename"] is None
+        if part["is_file"]:
+            file_info["filename"] = options.get(b"filename", b"").decode("utf-8", "replace")
+
+    def on_part_data(data, start, end):
+        if part["is_file"]:
+            received_pieces.append(data[start:end])
+
+    def on_part_end():
+        part["is_file"] = False
+
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+
+    digest = hashlib.sha256()
+    received = size = 0
+    try:
+        async with await anyio.open_file(dest_path, "wb") as out:
+            async for chunk in request.stream():
+                received += len(chunk)
+                if received > body_limit:
+                    raise _too_large()
+                parser.write(chunk)
+                filename = file_info["filename"]
+                if filename is not None and not filename.lower().endswith(".pdf"):
+                    raise HTTPException(status_code=400, detail="Only PDF files are allowed")
+                for piece in received_pieces:
+                    size += len(piece)
+                    if size > settings.max_file_size:
+                        raise _too_large()
+                    digest.update(piece)
+                    await out.write(piece)
+                received_pieces.clear()
+            parser.finalize()
+        if file_info["filename"] is None:
+            raise HTTPException(status_code=400, detail="No file part in the upload")
+    except MultipartParseError as e:
+        await anyio.Path(dest_path).unlink(missing_ok=True)
+        raise HTTPException(status_code=400, detail=f"Malformed multipart body: {e}")
+    except BaseException:
+        await anyio.Path(dest_path).unlink(missing_ok=True)
+        raise
+    return file_info["filename"], size, digest.hexdigest()
+
+
+@router.post("/", openapi_extra={"requestBody": UPLOAD_REQUEST_BODY})
+async def upload_pdf(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """
+    Upload a PDF as the `file` field of a multipart form.
+    """
     document_id = str(uuid.uuid4())
     dest_path = UPLOAD_DIR/f"{document_id}.pdf"
 
-    with open(dest_path, "wb") as f:
-        f.write(content)
-    
+    filename, size, content_hash = await _stream_to_disk(request, dest_path)
+    if not size:
+        await anyio.Path(dest_path).unlink(missing_ok=True)
+        raise HTTPException(status_code=400, detail="Empty file uploaded.")
+
+    # Same bytes already indexed: reuse its chunks, vectors and questions
+    existing = await db.run_sync(find_indexed_by_hash, content_hash)
+    if existing:
+        await anyio.Path(dest_path).unlink(missing_ok=True)
+        await db.run_sync(create_alias, existing, document_id, DUMMY_USER_ID, filename)
+        return JSONResponse({"document_id": document_id, "status": "indexed", "sha256": content_hash,
+                             "duplicate_of": existing.id}, status_code=200)
+
     doc = Document(id=document_id, user_id=DUMMY_USER_ID,
-                   filename=file.filename,file_path=str(dest_path),
-                   status="processing",created_at=datetime.now(),updated_at=datetime.now())
+                   filename=filename,file_path=str(dest_path),content_hash=content_hash,
+                   status="queued",created_at=datetime.now(),updated_at=datetime.now())
     db.add(doc)
-    db.commit()
+    await db.commit()
+
+    # publishing to the broker is blocking network I/O
+    await anyio.to_thread.run_sync(enqueue_ingestion, document_id, str(dest_path), DUMMY_USER_ID)
+
+    return JSONResponse({"document_id": document_id, "status": "queued", "sha256": content_hash},status_code=200)
 
-    background_tasks.add_task(start_ingestion_for_document, document_id, str(dest_path), DUMMY_USER_ID)
 
-    return JSONResponse({"document_id": document_id, "status": "processing"},status_code=200)
\ No newline at end of file
+@router.get("/{document_id}/status")
+async def ingestion_status(document_id: str, db: AsyncSession = Depends(get_async_db)):
+    """
+    Return the persisted ingestion job status for a document.
+    """
+    return await db.run_sync(get_progress_for_document, document_id)
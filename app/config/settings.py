@@ -3,9 +3,21 @@ from pydantic_settings import BaseSettings
 class Settings(BaseSettings):
     # Database
     database_url: str = "sqlite:///./quiz.db"
+    async_database_url: str = ""   # empty: derived from database_url (aiosqlite / asyncpg)
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: int = 30      # seconds to wait for a pooled connection
+    db_pool_recycle: int = 1800    # seconds before a connection is replaced
+    sqlite_busy_timeout_ms: int = 5000
+
+    # LLM provider ("gemini" or "stub" for offline benchmarking)
+    llm_provider: str = "gemini"
+    llm_stub_latency_ms: int = 200
+    llm_stub_failure_rate: float = 0.0
+    llm_retry_base_delay: float = 5.0   # seconds, doubled per rate-limited retry
 
     # Gemini API
-    gemini_api_key: str
+    gemini_api_key: str = ""
 
     # Pinecone
     pinecone_api_key: str
@@ -13,17 +25,55 @@ class Settings(BaseSettings):
     pinecone_index_name: str
     pinecone_dimension: int
 
+    # Vector store ("pinecone" or "local")
+    vector_backend: str = "pinecone"
+    local_index_path: str = "./vector_index"
+    lexical_index_path: str = "./lexical_index"   # per-document BM25 postings (.npz)
+
     # File storage
     upload_dir: str = "./uploads"
     max_file_size: int = 10_485_760
 
+    # Embedding cache
+    embedding_cache_enabled: bool = True
+    embedding_cache_path: str = "./embedding_cache.sqlite3"
+    embedding_cache_max_entries: int = 200_000
+    embedding_cache_dtype: str = "float16"  # or "float32"
+
+    # PDF extraction
+    extraction_engine: str = "pdfplumber"   # or "pymupdf" (much faster)
+    extraction_workers: int = 1             # >1 extracts page ranges in a process pool
+    extraction_pages_per_task: int = 8
+
     # Chunking
     chunk_size: int = 800
     chunk_overlap: int = 200
 
+    # Ingestion pipeline
+    ingest_embed_batch_size: int = 64     # chunks per get_embeddings call
+    ingest_upsert_batch_size: int = 100   # vectors per upsert_chunks call
+    ingest_prefetch_batches: int = 2      # chunk batches buffered ahead of embedding
+
     # Question generation
     default_question_count: int = 10
     max_question_count: int = 50
+    llm_max_concurrency: int = 4   # parallel per-chunk LLM calls
+    generation_chunk_count: int = 10       # chunks picked (by MMR) as generation context
+    generation_mmr_lambda: float = 0.5     # 1.0 = relevance only, 0.0 = diversity only
+    hybrid_vector_weight: float = 0.5      # topic relevance = w * vector + (1 - w) * BM25
+    topic_candidate_factor: int = 4        # MMR over the top k * factor chunks for a topic
+    generation_job_workers: int = 4        # concurrent background generation jobs
+    generation_job_retention: int = 200    # finished jobs kept for status lookups
+
+    # LLM response cache
+    llm_cache_enabled: bool = True
+    llm_cache_path: str = "./llm_cache.sqlite3"
+    llm_cache_ttl_seconds: int = 7 * 24 * 3600
+    llm_cache_max_entries: int = 10_000
+
+    # In-process question-set cache (per document)
+    question_cache_max_documents: int = 256
+    question_cache_ttl_seconds: int = 300
 
     # Grading thresholds
     mcq_passing_score: int = 70
@@ -38,6 +88,12 @@ class Settings(BaseSettings):
     redis_url: str
     celery_broker_url: str
     celery_result_backend: str
+    celery_task_always_eager: bool = False   # run tasks inline (tests / no broker)
+
+    # Ingestion worker queue
+    ingestion_worker_concurrency: int = 2
+    ingestion_max_retries: int = 3
+    ingestion_retry_backoff: int = 5         # seconds, doubled per retry
 
     # Logging
     log_level: str = "INFO"
@@ -0,0 +1,169 @@
+import json
+import logging
+import uuid
+from typing import List
+
+from sqlalchemy import delete, func, inspect, insert, select, text, update
+from sqlalchemy.engine import Engine
+
+from app.db.session import Base
+from app.models.attempt import QuestionAttempt
+from app.models.document import Document
+from app.models.progress import UserProgress
+from app.models.question import Question
+
+logger = logging.getLogger(__name__)
+
+LEGACY_PROGRESS_COLUMN = "answered_question_ids"
+
+
+def upgrade_schema(engine: Engine):
+    """
+    Bring tables created by earlier versions up to the models, after
+    `create_all` (which only creates missing tables): add missing columns and
+    indexes, give old SQLite question timestamps the stored format, then move
+    answers recorded in the retired `user_progress.answered_question_ids`
+    into `question_attempts` and fold progress kept under de-duplicated
+    aliases into their canonical document.
+    Safe to run on every startup.
+    """
+    _add_missing_columns(engine)
+    _add_missing_indexes(engine)
+    _normalize_sqlite_timestamps(engine)
+    _backfill_attempts(engine)
+    _merge_alias_progress(engine)
+
+
+def _add_missing_columns(engine: Engine):
+    inspector = inspect(engine)
+    quote = engine.dialect.identifier_preparer.quote
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                # added as nullable without constraints; the models fill values in
+                column_type = column.type.compile(dialect=engine.dialect)
+                logger.info("Adding column %s.%s (%s)", table.name, column.name, column_type)
+                conn.execute(text(f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} {column_type}"))
+
+
+def _add_missing_indexes(engine: Engine):
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+
+
+def _normalize_sqlite_timestamps(engine: Engine):
+    # questions stored through server_default CURRENT_TIMESTAMP lack the
+    # microseconds SQLAlchemy writes and binds, so the quiz cursor's
+    # (created_at, id) comparison would compare them as shorter strings
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.begin() as conn:
+        conn.execute(text(
+            "UPDATE questions SET created_at = strftime('%Y-%m-%d %H:%M:%f', created_at) || '000' "
+            "WHERE length(created_at) = 19"
+        ))
+
+
+def _backfill_attempts(engine: Engine):
+    inspector = inspect(engine)
+    if LEGACY_PROGRESS_COLUMN not in {c["name"] for c in inspector.get_columns("user_progress")}:
+        return
+
+    with engine.begin() as conn:
+        rows = conn.execute(text(
+            f"SELECT user_id, document_id, score, {LEGACY_PROGRESS_COLUMN} FROM user_progress "
+            f"WHERE {LEGACY_PROGRESS_COLUMN} IS NOT NULL"
+        )).all()
+        migrated = 0
+        for user_id, document_id, score, answered in rows:
+            question_ids = _parse_ids(answered)
+            questions = dict(conn.execute(
+                select(Question.id, Question.document_id).where(Question.id.in_(question_ids))
+            ).all()) if question_ids else {}
+            already = set(conn.execute(
+                select(QuestionAttempt.question_id).where(
+                    QuestionAttempt.user_id == user_id, QuestionAttempt.question_id.in_(list(questions))
+                )
+            ).scalars()) if questions else set()
+
+            # only the set of answered questions and the total score were kept, so
+            # the first `score` answers count as the correct ones; the per-question
+            # split is unknown but the total (and later re-scoring deltas) stay right
+            correct_left = score or 0
+            attempts = []
+            for question_id in question_ids:
+                if question_id not in questions or question_id in already:
+                    continue
+                attempts.append({
+                    "id": uuid.uuid4(),
+                    "user_id": user_id,
+                    "document_id": questions[question_id],
+                    "question_id": question_id,
+                    "correct": correct_left > 0,
+                })
+                correct_left -= 1
+            if attempts:
+                conn.execute(insert(QuestionAttempt), attempts)
+                migrated += len(attempts)
+            conn.execute(
+                text(f"UPDATE user_progress SET {LEGACY_PROGRESS_COLUMN} = NULL "
+                     "WHERE user_id = :user_id AND document_id = :document_id"),
+                {"user_id": user_id, "document_id": document_id},
+            )
+        if rows:
+            logger.info("Backfilled %d question attempts from %d progress rows", migrated, len(rows))
+
+
+def _merge_alias_progress(engine: Engine):
+    # progress rows were once keyed on the requested (possibly alias) document
+    # while attempts used the canonical one, splitting one quiz's score across
+    # rows; the canonical row's score is recomputed from the shared attempts
+    with engine.begin() as conn:
+        rows = conn.execute(
+            select(UserProgress.user_id, Document.id, Document.source_document_id)
+            .join(Document, Document.id == UserProgress.document_id)
+            .where(Document.source_document_id.is_not(None))
+        ).all()
+        for user_id, alias_id, canonical_id in rows:
+            correct = conn.execute(
+                select(func.count()).select_from(QuestionAttempt).where(
+                    QuestionAttempt.user_id == user_id,
+                    QuestionAttempt.document_id == canonical_id,
+                    QuestionAttempt.correct.is_(True),
+                )
+            ).scalar_one()
+            key = (UserProgress.user_id == user_id, UserProgress.document_id == canonical_id)
+            if conn.execute(select(UserProgress.user_id).where(*key)).first():
+                conn.execute(update(UserProgress).where(*key).values(score=correct))
+            else:
+                # no cursor: it is only a starting point, answered questions are skipped anyway
+                conn.execute(insert(UserProgress).values(user_id=user_id, document_id=canonical_id, score=correct))
+            conn.execute(delete(UserProgress).where(
+                UserProgress.user_id == user_id, UserProgress.document_id == alias_id
+            ))
+        if rows:
+            logger.info("Merged %d alias progress rows into their canonical documents", len(rows))
+
+
+def _parse_ids(answered) -> List[uuid.UUID]:
+    if isinstance(answered, (str, bytes)):
+        try:
+            answered = json.loads(answered)
+        except ValueError:
+            return []
+    ids = []
+    for value in answered or []:
+        try:
+            question_id = uuid.UUID(str(value))
+        except ValueError:
+            continue
+        if question_id not in ids:
+            ids.append(question_id)
+    return ids
@@ -1,13 +1,52 @@
-from sqlalchemy import create_engine
+import threading
+from typing import AsyncIterator, Dict
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.orm import sessionmaker
 from app.config.settings import settings
+from app.services.metrics import instrument_engine
 from sqlalchemy.orm import declarative_base
 
-engine = create_engine(
-    settings.database_url, 
-    pool_pre_ping=True,
-    connect_args={"check_same_thread": False}
-)
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+
+def _is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def _engine_options(url: str) -> Dict:
+    """
+    Connection options per backend: SQLite needs `check_same_thread` off for the
+    threaded workers; server databases get a sized, recycled pool.
+    """
+    if _is_sqlite(url):
+        return {"pool_pre_ping": True, "connect_args": {"check_same_thread": False}}
+    return {
+        "pool_pre_ping": True,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+    }
+
+
+def _enable_sqlite_wal(engine: Engine):
+    # WAL lets readers proceed while a writer commits; busy_timeout waits out
+    # the remaining write-write contention instead of failing with "locked"
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+        cursor.close()
+
+
+engine = create_engine(settings.database_url, **_engine_options(settings.database_url))
+if _is_sqlite(settings.database_url):
+    _enable_sqlite_wal(engine)
+instrument_engine(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -18,3 +57,48 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def async_database_url() -> str:
+    """
+    `settings.async_database_url`, or `database_url` with its async driver.
+    """
+    if settings.async_database_url:
+        return settings.async_database_url
+    url = make_url(settings.database_url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername)).render_as_string(
+        hide_password=False
+    )
+
+
+_async_sessionmaker = None
+_async_lock = threading.Lock()
+
+
+def get_async_sessionmaker():
+    """
+    Async engine + session factory, created on first use so the async driver
+    (aiosqlite / asyncpg) is only needed by processes that serve async routes.
+    """
+    global _async_sessionmaker
+    if _async_sessionmaker is None:
+        with _async_lock:
+            if _async_sessionmaker is None:
+                from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+                url = async_database_url()
+                async_engine = create_async_engine(url, **_engine_options(url))
+                if _is_sqlite(url):
+                    _enable_sqlite_wal(async_engine.sync_engine)
+                instrument_engine(async_engine.sync_engine)
+                _async_sessionmaker = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    return _async_sessionmaker
+
+
+async def get_async_db() -> AsyncIterator:
+    """
+    FastAPI dependency for `async def` routes. Sync service functions can run
+    on it with `await db.run_sync(fn, *args)`.
+    """
+    async with get_async_sessionmaker()() as db:
+        yield db
@@ -1,19 +1,22 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 from app.api import upload  
-from app.services.vector_db import init_pinecone
+from app.services.vector_db import init_vector_store
 from app.db.session import Base, engine
+from app.db.migrations import upgrade_schema
 from app.api import questions
-from app.models import document, progress, question, user
+from app.models import document, progress, question, user, attempt
 from app.api import skillquestion
+from app.api import quiz
+from app.services.metrics import MetricsMiddleware, render_metrics
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     try:
-        init_pinecone()
+        init_vector_store()
     except Exception as e:
-        print("Pinecone init failed:", e)
+        print("Vector store init failed:", e)
     
     from sqlalchemy import inspect
     inspector = inspect(engine)
@@ -21,6 +24,7 @@ async def lifespan(app: FastAPI):
     print(f"DEBUG: Existing database tables: {tables}")
     
     Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
     
     inspector = inspect(engine)
     tables = inspector.get_table_names()
@@ -30,11 +34,19 @@ async def lifespan(app: FastAPI):
 
 app = FastAPI(title="RAG Quiz Microservice", lifespan=lifespan)
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(upload.router, prefix="/upload", tags=["upload"])
 app.include_router(questions.router, prefix="/questions", tags=["questions"]) 
 app.include_router(skillquestion.router,prefix="/skill",tags=["skillquestion"])
+app.include_router(quiz.router, prefix="/quiz", tags=["quiz"])
 
 @app.get("/")
 def read_root():
     return {"message": "Welcome to RAG QUIZ Microservice"}
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
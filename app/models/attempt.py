@@ -0,0 +1,21 @@
+from sqlalchemy import Column, String, Integer, Boolean, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+from sqlalchemy.dialects.postgresql import UUID
+import uuid
+from app.db.session import Base
+
+class QuestionAttempt(Base):
+    __tablename__ = "question_attempts"
+    __table_args__ = (
+        # one row per answered question; also serves the NOT EXISTS probe in get_next_question_for_user
+        Index("ux_attempts_user_document_question", "user_id", "document_id", "question_id", unique=True),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(String, ForeignKey("users.id"), nullable=False)
+    document_id = Column(String, ForeignKey("documents.id"), nullable=False)  # canonical document
+    question_id = Column(UUID(as_uuid=True), ForeignKey("questions.id", ondelete="CASCADE"), nullable=False)
+    correct = Column(Boolean, nullable=False, default=False)
+    elapsed_seconds = Column(Integer, nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, onupdate=func.now(), server_default=func.now())
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, Text, ForeignKey
+from sqlalchemy import Column, String, DateTime, Text, ForeignKey, JSON, Integer
 from sqlalchemy.sql import func
 from app.db.session import Base
 
@@ -9,7 +9,13 @@ class Document(Base):
     user_id = Column(String, ForeignKey("users.id"), nullable=False)
     filename = Column(String, nullable=False)
     file_path = Column(Text, nullable=False)
-    status = Column(String, default="uploaded")
+    status = Column(String, default="uploaded")  # uploaded / queued / processing / retrying / indexed / failed
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, onupdate=func.now(), server_default=func.now())
     excerpt = Column(Text, nullable=True)
+    processing_started_at = Column(DateTime, nullable=True)
+    ingestion_attempts = Column(Integer, default=0)
+    ingestion_error = Column(Text, nullable=True)
+    chunk_ids = Column(JSON, nullable=True)  # vector-store IDs recorded at ingestion, in document order
+    content_hash = Column(String, index=True, nullable=True)  # sha256 of the uploaded file
+    source_document_id = Column(String, ForeignKey("documents.id"), nullable=True)  # set on de-duplicated aliases
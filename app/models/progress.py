@@ -1,4 +1,5 @@
-from sqlalchemy import Column, String, Integer, JSON, DateTime, ForeignKey
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey
+from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from app.db.session import Base
 
@@ -7,7 +8,9 @@ class UserProgress(Base):
     
     user_id = Column(String, ForeignKey("users.id"), primary_key=True)
     document_id = Column(String, ForeignKey("documents.id"), primary_key=True)
-    answered_question_ids = Column(JSON, default=[])
+    # keyset cursor: every question ordered before (cursor_created_at, cursor_question_id) is answered
+    cursor_created_at = Column(DateTime, nullable=True)
+    cursor_question_id = Column(UUID(as_uuid=True), nullable=True)
     score = Column(Integer, default=0)
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, onupdate=func.now(), server_default=func.now())
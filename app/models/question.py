@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, JSON, DateTime, ForeignKey
+from sqlalchemy import Column, String, Integer, JSON, DateTime, ForeignKey, Index
 from sqlalchemy.sql import func
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
@@ -6,6 +6,10 @@ from app.db.session import Base
 
 class Question(Base):
     __tablename__ = "questions"
+    __table_args__ = (
+        # keyset order for the quiz cursor: (created_at, id) within a document
+        Index("ix_questions_document_created_id", "document_id", "created_at", "id"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     document_id = Column(String, ForeignKey("documents.id"), index=True)
@@ -13,6 +17,8 @@ class Question(Base):
     question_text = Column(String)
     options = Column(JSON, nullable=True)
     answer = Column(String, nullable=True)
+    answer_key = Column(String, nullable=True)  # normalised answer, precomputed for grading
+    answer_index = Column(Integer, nullable=True)  # index of the correct MCQ option
     question_metadata = Column("metadata", JSON, nullable=True)
     created_at = Column(DateTime, server_default=func.now())
 
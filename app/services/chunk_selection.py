@@ -0,0 +1,108 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.services.embeddings import get_embeddings
+from app.services.lexical_index import load_document_index
+
+
+def mmr_select(
+    vectors: np.ndarray,
+    k: int,
+    lambda_mult: float = 0.5,
+    query: Optional[np.ndarray] = None,
+    relevance: Optional[np.ndarray] = None,
+) -> List[int]:
+    """
+    Maximal marginal relevance over row vectors: greedily pick `k` rows that are
+    relevant (precomputed `relevance`, else similarity to `query`, else to the
+    document centroid) but dissimilar to the rows already picked. Returns row
+    indices in ascending (document) order.
+
+    Each pick costs one (n, dim) mat-vec to update every row's similarity to
+    the selected set, so the whole selection is O(k * n * dim).
+    """
+    v = np.asarray(vectors, dtype=np.float32)
+    n = v.shape[0]
+    if k >= n:
+        return list(range(n))
+    v = v / np.maximum(np.linalg.norm(v, axis=1, keepdims=True), 1e-12)
+
+    if relevance is None:
+        target = v.mean(axis=0) if query is None else np.asarray(query, dtype=np.float32)
+        target = target / max(float(np.linalg.norm(target)), 1e-12)
+        relevance = v @ target
+
+    max_sim = np.zeros(n, dtype=np.float32)  # similarity to the closest selected row
+    available = np.ones(n, dtype=bool)
+    selected = []
+    for step in range(k):
+        scores = lambda_mult * relevance
+        if step:
+            scores = scores - (1.0 - lambda_mult) * max_sim
+        scores = np.where(available, scores, -np.inf)
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        sims = v @ v[best]
+        max_sim = sims if step == 0 else np.maximum(max_sim, sims)
+    return sorted(selected)
+
+
+def _scale(scores: np.ndarray) -> np.ndarray:
+    lo, hi = float(scores.min()), float(scores.max())
+    return (scores - lo) / (hi - lo) if hi > lo else np.zeros_like(scores)
+
+
+def hybrid_scores(vector_scores: np.ndarray, lexical_scores: np.ndarray, vector_weight: float = 0.5) -> np.ndarray:
+    """
+    Fuse cosine and BM25 scores for the same chunks after min-max scaling each
+    to [0, 1] (their raw ranges are not comparable).
+    """
+    return vector_weight * _scale(vector_scores) + (1.0 - vector_weight) * _scale(lexical_scores)
+
+
+def topic_relevance(document_id: str, chunks: List[Dict], topic: str, vector_weight: float = 0.5) -> np.ndarray:
+    """
+    Hybrid relevance of each chunk (with stored 'values') to a free-text topic:
+    cosine to the topic embedding fused with the document's BM25 scores.
+    Falls back to vector scores alone if the document has no lexical index.
+    """
+    vectors = np.stack([np.asarray(c["values"], dtype=np.float32) for c in chunks])
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    query = np.asarray(get_embeddings([topic])[0], dtype=np.float32)
+    vector_scores = vectors @ (query / max(float(np.linalg.norm(query)), 1e-12))
+
+    index = load_document_index(document_id)
+    if index is None:
+        return vector_scores
+    position = {cid: i for i, cid in enumerate(index.chunk_ids.tolist())}
+    bm25 = index.score(topic)
+    lexical_scores = np.array([bm25[position[c["chunk_id"]]] if c.get("chunk_id") in position else 0.0
+                               for c in chunks], dtype=np.float32)
+    return hybrid_scores(vector_scores, lexical_scores, vector_weight)
+
+
+def select_diverse_chunks(
+    chunks: List[Dict],
+    k: int,
+    lambda_mult: float = 0.5,
+    relevance: Optional[np.ndarray] = None,
+    candidates: Optional[int] = None,
+) -> List[Dict]:
+    """
+    Pick `k` chunks by MMR using their stored embeddings ('values'). With a
+    `relevance` score per chunk, MMR runs over the `candidates` most relevant
+    chunks only. Chunks without embeddings (e.g. fallback content) are cut to
+    the first `k`.
+    """
+    if len(chunks) <= k and relevance is None:
+        return chunks
+    if any(c.get("values") is None for c in chunks):
+        return chunks[:k]
+    rows = np.arange(len(chunks))
+    if relevance is not None and candidates and candidates < len(chunks):
+        rows = np.sort(np.argpartition(-relevance, candidates - 1)[:candidates])
+    vectors = np.stack([np.asarray(chunks[i]["values"], dtype=np.float32) for i in rows])
+    picked = mmr_select(vectors, k, lambda_mult, relevance=None if relevance is None else relevance[rows])
+    return [chunks[rows[i]] for i in picked]
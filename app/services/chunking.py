@@ -1,5 +1,25 @@
+from typing import Iterable, Iterator
+
+
 def chunk_text(text: str, chunk_size: int = 800, overlap: int = 200):
     tokens = text.split()
     step = max(1, chunk_size - overlap)
     for i in range(0, len(tokens), step):
-        yield " ".join(tokens[i:i + chunk_size])
\ No newline at end of file
+        yield " ".join(tokens[i:i + chunk_size])
+
+
+def chunk_pages(pages: Iterable[str], chunk_size: int = 800, overlap: int = 200) -> Iterator[str]:
+    """
+    Streaming equivalent of `chunk_text("\\n".join(pages))`: yields the same
+    windows while holding at most one window plus one page of tokens.
+    """
+    step = max(1, chunk_size - overlap)
+    buffer = []
+    for page in pages:
+        buffer.extend(page.split())
+        while len(buffer) >= chunk_size:
+            yield " ".join(buffer[:chunk_size])
+            del buffer[:step]
+    while buffer:
+        yield " ".join(buffer[:chunk_size])
+        del buffer[:step]
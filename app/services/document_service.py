@@ -0,0 +1,49 @@
+from typing import Optional
+from sqlalchemy.orm import Session
+from app.models.document import Document
+
+
+def find_indexed_by_hash(db: Session, content_hash: str) -> Optional[Document]:
+    """
+    Return the original (non-alias) indexed document with this content hash, if any.
+    """
+    return (
+        db.query(Document)
+        .filter(
+            Document.content_hash == content_hash,
+            Document.status == "indexed",
+            Document.source_document_id.is_(None),
+        )
+        .order_by(Document.created_at)
+        .first()
+    )
+
+
+def canonical_document_id(db: Session, document_id: str) -> str:
+    """
+    Resolve an alias to the document whose chunks, vectors and questions it shares.
+    """
+    row = db.query(Document.source_document_id).filter(Document.id == document_id).first()
+    if row and row[0]:
+        return row[0]
+    return document_id
+
+
+def create_alias(db: Session, source: Document, document_id: str, user_id: str, filename: str) -> Document:
+    """
+    Register an upload whose content matches `source` as an already-indexed alias.
+    """
+    alias = Document(
+        id=document_id,
+        user_id=user_id,
+        filename=filename,
+        file_path=source.file_path,
+        status="indexed",
+        content_hash=source.content_hash,
+        source_document_id=source.id,
+        chunk_ids=source.chunk_ids,
+        excerpt=source.excerpt,
+    )
+    db.add(alias)
+    db.commit()
+    return alias
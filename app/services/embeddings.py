@@ -31,21 +31,137 @@
 
 
 #alternative :can use oLLama
-#fake embeddings just for implementing the RAG
+#local embeddings: hashed word n-grams + fixed random projection (no network)
 
-from typing import List
+import re
+import threading
+import zlib
+from typing import List, Optional
 import numpy as np  
 
+from app.config.settings import settings
+from app.services.embedding_cache import EmbeddingCache
+from app.services.metrics import CACHE_REQUESTS, EMBEDDING_BATCH_SECONDS, EMBEDDING_TEXTS
+
+NUM_BUCKETS = 8192      # hashed feature space before projection
+PROJECTION_SEED = 1337
+EMBED_BATCH = 256       # texts per dense feature block
+MAX_MEMO_TOKENS = 1_000_000
+TOKEN_RE = re.compile(r"\w+")
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+EMBEDDING_MODEL = f"hashed-ngram-v1-{settings.pinecone_dimension}"
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+_projection: Optional[np.ndarray] = None
+_token_hashes: dict = {}
+_token_hashes_lock = threading.Lock()   # embedding runs in thread-pool workers
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    global _cache
+    if _cache is None and settings.embedding_cache_enabled:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache(
+                    settings.embedding_cache_path,
+                    max_entries=settings.embedding_cache_max_entries,
+                    dtype=settings.embedding_cache_dtype,
+                )
+    return _cache
+
+
+def _get_projection() -> np.ndarray:
+    global _projection
+    if _projection is None:
+        rng = np.random.default_rng(PROJECTION_SEED)
+        _projection = rng.standard_normal((NUM_BUCKETS, settings.pinecone_dimension), dtype=np.float32)
+    return _projection
+
+
+def _hash_tokens(tokens: List[str]) -> List[int]:
+    # hash each distinct token once; the memo keeps the per-token cost a dict lookup
+    with _token_hashes_lock:
+        if len(_token_hashes) > MAX_MEMO_TOKENS:
+            _token_hashes.clear()
+        for t in set(tokens).difference(_token_hashes):
+            _token_hashes[t] = zlib.crc32(t.encode("utf-8"))
+        return list(map(_token_hashes.__getitem__, tokens))
+
+
+def _bucket_and_sign(hashes: np.ndarray):
+    mixed = hashes * _MIX
+    buckets = (mixed >> np.uint64(32)) % np.uint64(NUM_BUCKETS)
+    signs = np.where(mixed >> np.uint64(63), -1.0, 1.0)
+    return buckets.astype(np.int64), signs
+
+
+def _embed_block(texts: List[str]) -> np.ndarray:
+    n = len(texts)
+    tokens = []
+    lengths = np.empty(n, dtype=np.int64)
+    for i, text in enumerate(texts):
+        text_tokens = TOKEN_RE.findall(text.lower())
+        lengths[i] = len(text_tokens)
+        tokens.extend(text_tokens)
+
+    h = np.asarray(_hash_tokens(tokens), dtype=np.uint64)
+    owner = np.repeat(np.arange(n), lengths)
+
+    # unigrams, plus bigrams of adjacent tokens that belong to the same text
+    same_text = owner[1:] == owner[:-1]
+    bigrams = (h[:-1] * np.uint64(1_000_003)) ^ (h[1:] + np.uint64(0x5BD1E995))
+    feature_hashes = np.concatenate([h, bigrams[same_text]])
+    feature_owner = np.concatenate([owner, owner[1:][same_text]])
+
+    buckets, signs = _bucket_and_sign(feature_hashes)
+    counts = np.bincount(feature_owner * NUM_BUCKETS + buckets, weights=signs, minlength=n * NUM_BUCKETS)
+    counts = counts.reshape(n, NUM_BUCKETS).astype(np.float32)
+    features = np.sign(counts) * np.log1p(np.abs(counts))
+
+    out = features @ _get_projection()
+    norms = np.linalg.norm(out, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return out / norms
+
+
+def _embed(texts: List[str]) -> np.ndarray:
+    """
+    Deterministic local embeddings: signed hashed word unigrams/bigrams with
+    sublinear term frequency, projected to `settings.pinecone_dimension` by a
+    fixed Gaussian matrix and L2-normalised.
+    """
+    blocks = [_embed_block(texts[i:i + EMBED_BATCH]) for i in range(0, len(texts), EMBED_BATCH)]
+    return np.vstack(blocks) if blocks else np.empty((0, settings.pinecone_dimension), dtype=np.float32)
+
+
 def get_embeddings(texts: List[str]) -> List[List[float]]:
     """
-    Fake embeddings for testing without calling Gemini.
-    Generates random 768-dim vectors for each text.
+    Embed texts, serving repeats from the embedding cache and embedding
+    only the (de-duplicated) misses in one batch.
     """
     if not texts:
         return []
 
-    dim = 1024 
-    return [np.random.rand(dim).tolist() for _ in texts]
+    with EMBEDDING_BATCH_SECONDS.time():
+        cache = get_embedding_cache()
+        if cache is None:
+            EMBEDDING_TEXTS.inc(len(texts))
+            return _embed(texts).tolist()
+
+        vectors = cache.get_many(EMBEDDING_MODEL, texts)
+        missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+        hits = len(texts) - sum(v is None for v in vectors)
+        CACHE_REQUESTS.labels("embedding", "hit").inc(hits)
+        CACHE_REQUESTS.labels("embedding", "miss").inc(len(texts) - hits)
+        EMBEDDING_TEXTS.inc(len(missing))
+        if missing:
+            # the stored (quantised) values, not the raw ones: a later hit returns these
+            fresh = cache.put_many(EMBEDDING_MODEL, missing, _embed(missing))
+            by_text = dict(zip(missing, fresh))
+            vectors = [v if v is not None else by_text[t] for t, v in zip(texts, vectors)]
+        return np.vstack(vectors).tolist()
 
 
 
@@ -0,0 +1,117 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from app.config.settings import settings
+from app.db.session import SessionLocal
+from app.services.metrics import GENERATION_JOB_SECONDS
+from app.services.question_service import trigger_generate_questions
+
+FINISHED = ("completed", "failed")
+
+
+class GenerationJob:
+    """
+    One question-generation run. Saved batches are appended to an event log
+    that status polls and SSE streams read from.
+    """
+
+    def __init__(self, document_id: str, params: Dict):
+        self.id = str(uuid.uuid4())
+        self.document_id = document_id
+        self.params = params
+        self.status = "queued"
+        self.error: Optional[str] = None
+        self.question_count = 0
+        self.created_at = datetime.now()
+        self.finished_at: Optional[datetime] = None
+        self._events: List[Tuple[str, object]] = []
+        self._lock = threading.Lock()
+
+    def publish(self, event: str, data):
+        with self._lock:
+            if event == "questions":
+                self.question_count += len(data)
+            self._events.append((event, data))
+
+    def events_since(self, cursor: int) -> List[Tuple[str, object]]:
+        with self._lock:
+            return self._events[cursor:]
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.id,
+            "document_id": self.document_id,
+            "status": self.status,
+            "question_count": self.question_count,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+_jobs: "OrderedDict[str, GenerationJob]" = OrderedDict()
+_jobs_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=settings.generation_job_workers, thread_name_prefix="qgen")
+
+
+def _set_status(job: GenerationJob, status: str, error: Optional[str] = None):
+    job.status = status
+    job.error = error
+    if status in FINISHED:
+        job.finished_at = datetime.now()
+    job.publish("status", job.to_dict())
+
+
+def _run(job: GenerationJob):
+    db = SessionLocal()
+    started = time.perf_counter()
+    try:
+        _set_status(job, "running")
+        ok = trigger_generate_questions(
+            db=db,
+            document_id=job.document_id,
+            on_questions=lambda rows: job.publish("questions", rows),
+            **job.params,
+        )
+        if ok:
+            _set_status(job, "completed")
+        else:
+            _set_status(job, "failed", "Question generation failed")
+    except Exception as e:
+        _set_status(job, "failed", repr(e))
+    finally:
+        GENERATION_JOB_SECONDS.labels(job.status).observe(time.perf_counter() - started)
+        db.close()
+
+
+def _prune():
+    # drop the oldest finished jobs once over the retention limit
+    excess = len(_jobs) - settings.generation_job_retention
+    for job_id in [j.id for j in _jobs.values() if j.finished][:max(0, excess)]:
+        del _jobs[job_id]
+
+
+def start_generation_job(document_id: str, **params) -> GenerationJob:
+    """
+    Queue `trigger_generate_questions` on the job executor and return immediately.
+    """
+    job = GenerationJob(document_id, params)
+    with _jobs_lock:
+        _jobs[job.id] = job
+        _prune()
+    _executor.submit(_run, job)
+    return job
+
+
+def get_job(job_id: str) -> Optional[GenerationJob]:
+    with _jobs_lock:
+        return _jobs.get(job_id)
@@ -0,0 +1,44 @@
+import json
+from typing import Dict, List, Optional, Tuple
+
+
+def normalize_answer(text: Optional[str]) -> str:
+    return (text or "").strip().lower()
+
+
+def compile_answer_key(
+    question_type: Optional[str], options: Optional[List[str]], answer: Optional[str]
+) -> Tuple[str, Optional[int]]:
+    """
+    Precompute what grading compares against: the normalised answer text and,
+    for MCQs, the index of the option matching it (None if no option does).
+    """
+    answer_key = normalize_answer(answer)
+    answer_index = None
+    if question_type == "mcq" and options:
+        for i, option in enumerate(options):
+            if normalize_answer(option) == answer_key:
+                answer_index = i
+                break
+    return answer_key, answer_index
+
+
+def is_correct(question_type: Optional[str], answer_key: str, answer_index: Optional[int], user_answer: Dict) -> bool:
+    """
+    Grade one answer against a compiled key. Pure: no database access.
+    """
+    if question_type == "mcq":
+        # user_answer expected to be {"selected_index": int}
+        selected_index = user_answer.get("selected_index")
+        return answer_index is not None and selected_index == answer_index
+
+    if question_type == "short":
+        # user_answer expected to be {"text": "..."}
+        return normalize_answer(user_answer.get("text", "")) == answer_key
+
+    # For other types (match etc.), fallback to string compare
+    try:
+        user_text = json.dumps(user_answer)
+    except Exception:
+        user_text = str(user_answer)
+    return normalize_answer(user_text) == answer_key
@@ -0,0 +1,109 @@
+import json
+from typing import Dict, Iterable, Iterator, List
+
+
+class JSONObjectStream:
+    """
+    Incrementally pull complete top-level JSON objects out of model output.
+
+    Text can be fed in arbitrary pieces (e.g. a streamed response). Every
+    balanced `{...}` span is decoded as soon as its closing brace arrives, so
+    one malformed element costs only that element: when a span does not
+    decode, the objects nested inside it are recovered instead (this handles a
+    question whose closing brace is missing and swallowed its neighbour).
+    Prose, code fences and the surrounding `[`/`]` are ignored.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._start = -1
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, text: str) -> List[Dict]:
+        """
+        Add text and return the objects completed by it.
+        """
+        self._buffer += text
+        found = []
+        buf = self._buffer
+        i = self._pos
+        while i < len(buf):
+            ch = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                if self._depth > 0:
+                    self._in_string = True
+            elif ch == "{":
+                if self._depth == 0:
+                    self._start = i
+                self._depth += 1
+            elif ch == "}" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    found.extend(_decode(buf[self._start:i + 1]))
+                    self._start = -1
+            i += 1
+
+        # drop consumed text so the buffer only holds the open object
+        keep_from = self._start if self._start >= 0 else len(buf)
+        self._buffer = buf[keep_from:]
+        self._pos = len(buf) - keep_from
+        if self._start >= 0:
+            self._start = 0
+        return found
+
+    def close(self) -> List[Dict]:
+        """
+        End of input: salvage complete objects from a truncated trailing one.
+        """
+        found = []
+        if self._start >= 0:
+            found = _recover(self._buffer[self._start:])
+        self.__init__()
+        return found
+
+
+def _decode(span: str) -> List[Dict]:
+    try:
+        data = json.loads(span)
+    except json.JSONDecodeError:
+        return _recover(span)
+    if not isinstance(data, dict):
+        return []
+    if "question" not in data:
+        # wrapper such as {"questions": [...]}: unwrap its list of objects
+        for value in data.values():
+            if isinstance(value, list) and value and all(isinstance(v, dict) for v in value):
+                return value
+    return [data]
+
+
+def _recover(span: str) -> List[Dict]:
+    # re-scan inside the broken span, skipping its opening brace
+    inner = JSONObjectStream()
+    found = inner.feed(span[1:])
+    found.extend(inner.close())
+    return found
+
+
+def iter_json_objects(pieces: Iterable[str]) -> Iterator[Dict]:
+    """
+    Yield objects from an iterable of text pieces as soon as each one completes.
+    """
+    stream = JSONObjectStream()
+    for piece in pieces:
+        yield from stream.feed(piece)
+    yield from stream.close()
+
+
+def parse_json_objects(text: str) -> List[Dict]:
+    return list(iter_json_objects([text]))
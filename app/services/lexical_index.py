@@ -0,0 +1,178 @@
+import os
+import re
+import threading
+from array import array
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.config.settings import settings
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were which with".split()
+)
+BM25_K1 = 1.2
+BM25_B = 0.75
+LOADED_INDEX_CACHE = 64
+MAX_TF = 65535  # term frequencies are stored as uint16; BM25 saturates long before this
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_RE.findall(text.lower()) if len(t) > 1 and t not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    Per-document inverted index over chunk text in CSR form: the postings of
+    `terms[t]` are `chunks[indptr[t]:indptr[t+1]]` with term frequencies
+    `tfs[...]`. `terms` is sorted, so lookups are a binary search and scoring
+    is a handful of array operations per query term.
+    """
+
+    def __init__(self, chunk_ids: np.ndarray, terms: np.ndarray, indptr: np.ndarray,
+                 chunks: np.ndarray, tfs: np.ndarray, doc_len: np.ndarray):
+        self.chunk_ids = chunk_ids
+        self.terms = terms
+        self.indptr = indptr
+        self.chunks = chunks
+        self.tfs = tfs
+        self.doc_len = doc_len
+        self._avg_len = float(doc_len.mean()) if len(doc_len) else 0.0
+
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+    def score(self, query: str) -> np.ndarray:
+        """
+        BM25 score of every chunk for `query`, aligned with `chunk_ids`.
+        """
+        n = len(self.chunk_ids)
+        scores = np.zeros(n, dtype=np.float32)
+        q_terms = np.array(sorted(set(tokenize(query))), dtype=str)
+        if not n or not len(q_terms) or not len(self.terms):
+            return scores
+
+        pos = np.searchsorted(self.terms, q_terms)
+        inside = pos < len(self.terms)
+        pos = pos[inside]
+        pos = pos[self.terms[pos] == q_terms[inside]]
+        if not len(pos):
+            return scores
+
+        starts, ends = self.indptr[pos], self.indptr[pos + 1]
+        df = (ends - starts).astype(np.float32)
+        idf = np.log1p((n - df + 0.5) / (df + 0.5))
+        postings = np.concatenate([np.arange(s, e) for s, e in zip(starts, ends)])
+        term_idf = np.repeat(idf, ends - starts)
+
+        docs = self.chunks[postings]
+        tf = self.tfs[postings].astype(np.float32)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len[docs] / max(self._avg_len, 1e-9))
+        contrib = term_idf * tf * (BM25_K1 + 1) / (tf + norm)
+        scores += np.bincount(docs, weights=contrib, minlength=n).astype(np.float32)
+        return scores
+
+    def save(self, path: str):
+        """
+        Write to `path` (.npz) atomically.
+        """
+        target = Path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(target.name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, chunk_ids=self.chunk_ids, terms=self.terms, indptr=self.indptr,
+                     chunks=self.chunks, tfs=self.tfs, doc_len=self.doc_len)
+        os.replace(tmp, target)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["chunk_ids"], data["terms"], data["indptr"],
+                       data["chunks"], data["tfs"], data["doc_len"])
+
+
+class BM25Builder:
+    """
+    Accumulates chunks during ingestion; `build()` produces the CSR index.
+    Postings are kept in typed arrays (6 bytes each), not lists of ints, so a
+    long document's pending index stays a small fraction of its text.
+    """
+
+    def __init__(self):
+        self._chunk_ids: List[str] = []
+        self._term_ids: Dict[str, int] = {}
+        # flat postings in chunk order: term id, frequency, and per-chunk counts
+        self._post_terms = array("I")
+        self._post_tfs = array("H")
+        self._unique_terms = array("I")
+        self._doc_len = array("I")
+
+    def add(self, chunk_id: str, text: str):
+        counts = Counter(tokenize(text))
+        term_ids = self._term_ids
+        self._post_terms.extend(term_ids.setdefault(term, len(term_ids)) for term in counts)
+        self._post_tfs.extend(min(tf, MAX_TF) for tf in counts.values())
+        self._unique_terms.append(len(counts))
+        self._chunk_ids.append(chunk_id)
+        self._doc_len.append(sum(counts.values()))
+
+    def build(self) -> BM25Index:
+        vocab = np.array(list(self._term_ids), dtype=str)
+        order = np.argsort(vocab, kind="stable")
+        rank = np.empty(len(vocab), dtype=np.int64)
+        rank[order] = np.arange(len(vocab))
+
+        tfs = np.frombuffer(self._post_tfs, dtype=np.uint16)
+        chunks = np.repeat(np.arange(len(self._chunk_ids), dtype=np.int32),
+                           np.frombuffer(self._unique_terms, dtype=np.uint32))
+        terms = rank[np.frombuffer(self._post_terms, dtype=np.uint32)]
+        by_term = np.lexsort((chunks, terms))
+
+        indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=len(vocab)), out=indptr[1:])
+        return BM25Index(
+            chunk_ids=np.array(self._chunk_ids, dtype=str),
+            terms=vocab[order],
+            indptr=indptr,
+            chunks=chunks[by_term],
+            tfs=tfs[by_term],
+            doc_len=np.frombuffer(self._doc_len, dtype=np.uint32).astype(np.float32),
+        )
+
+
+_loaded: "OrderedDict[str, BM25Index]" = OrderedDict()
+_loaded_lock = threading.Lock()
+
+
+def _index_path(document_id: str) -> str:
+    return os.path.join(settings.lexical_index_path, f"{document_id}.npz")
+
+
+def save_document_index(document_id: str, index: BM25Index):
+    index.save(_index_path(document_id))
+    with _loaded_lock:
+        _loaded.pop(document_id, None)
+
+
+def load_document_index(document_id: str) -> Optional[BM25Index]:
+    """
+    The document's BM25 index (kept in a small LRU once loaded), or None if
+    the document was ingested before lexical indexing existed.
+    """
+    with _loaded_lock:
+        index = _loaded.get(document_id)
+        if index is not None:
+            _loaded.move_to_end(document_id)
+            return index
+    path = _index_path(document_id)
+    if not os.path.exists(path):
+        return None
+    index = BM25Index.load(path)
+    with _loaded_lock:
+        _loaded[document_id] = index
+        while len(_loaded) > LOADED_INDEX_CACHE:
+            _loaded.popitem(last=False)
+    return index
@@ -0,0 +1,137 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from app.services.metrics import CACHE_REQUESTS
+
+_HITS = CACHE_REQUESTS.labels("llm_response", "hit")
+_MISSES = CACHE_REQUESTS.labels("llm_response", "miss")
+_COALESCED = CACHE_REQUESTS.labels("llm_response", "coalesced")
+
+
+def cache_key(model: str, prompt: str, params: Dict) -> str:
+    payload = json.dumps([model, prompt, params], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Persistent prompt -> response cache in a single SQLite file.
+
+    Entries expire after `ttl_seconds`; past `max_entries` the least recently
+    used ones are evicted. Concurrent requests for the same key are collapsed
+    into one model call (single-flight).
+    """
+
+    def __init__(self, path: str, ttl_seconds: int = 7 * 24 * 3600, max_entries: int = 10_000):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_responses_last_used ON responses (last_used)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                self._count -= 1
+                row = None
+            if row is None:
+                self.misses += 1
+                _MISSES.inc()
+                return None
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            _HITS.inc()
+            return row[0]
+
+    def put(self, key: str, response: str):
+        now = time.time()
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._count -= self._conn.total_changes - before
+            self._conn.execute(
+                "INSERT INTO responses (key, response, created_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, response, now, now),
+            )
+            self._count += 1
+            excess = self._count - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY last_used LIMIT ?)", (excess,)
+                )
+                self._count -= excess
+            self._conn.commit()
+
+    def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], str],
+        bypass: bool = False,
+        should_store: Callable[[str], bool] = bool,
+    ) -> str:
+        """
+        Return the cached response for `key`, or call `compute` once for all
+        concurrent callers and cache the result if `should_store` accepts it
+        (default: non-empty). `bypass` skips the read (e.g. on regenerate) but
+        still stores the fresh response.
+        """
+        if not bypass:
+            cached = self.get(key)
+            if cached is not None:
+                return cached
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+            else:
+                self.coalesced += 1
+                _COALESCED.inc()
+        if not leader:
+            return future.result()
+
+        try:
+            response = compute()
+            if should_store(response):
+                self.put(key, response)
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self) -> Dict:
+        return {"hits": self.hits, "misses": self.misses, "coalesced": self.coalesced, "entries": self._count}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
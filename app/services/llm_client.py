@@ -1,28 +1,47 @@
-import google.generativeai as genai
-import json, re, time, math
-from typing import List, Dict
+import re, time, math, threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, List, Dict, Optional
 from app.config.settings import settings
+from app.services.llm_cache import LLMResponseCache, cache_key
+from app.services.llm_providers import RateLimitError, get_provider
+from app.services.json_stream import parse_json_objects
+from app.services.metrics import LLM_RETRIES, observe_llm_call
 import logging
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
-# Configure Gemini once
-logger.debug("[DEBUG] Configuring Gemini API…")
-genai.configure(api_key=settings.gemini_api_key)
-
 # -------------------------------------------------
 CHUNK_MAX_TOKENS   = 9_500
 USE_FLASH          = True
 COMPRESS_FIRST     = False
 TOKENS_PER_CHAR    = 0.25
+GENERATION_PARAMS  = {}       # passed to generate_content; part of the cache key
+PROMPT_OVERHEAD_TOKENS = 400  # instructions + JSON format block around the content
+CHUNK_SEPARATOR    = "\n\n---\n\n"
 # -------------------------------------------------
 
-def _count_tokens(text: str) -> int:
+_response_cache: Optional[LLMResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+def get_response_cache() -> Optional[LLMResponseCache]:
+    global _response_cache
+    if _response_cache is None and settings.llm_cache_enabled:
+        with _response_cache_lock:
+            if _response_cache is None:
+                _response_cache = LLMResponseCache(
+                    settings.llm_cache_path,
+                    ttl_seconds=settings.llm_cache_ttl_seconds,
+                    max_entries=settings.llm_cache_max_entries,
+                )
+    return _response_cache
+
+def count_tokens(text: str) -> int:
+    """Estimated token count (chars * TOKENS_PER_CHAR); also used for section budgets."""
     return math.ceil(len(text) * TOKENS_PER_CHAR)
 
 def _truncate_to_budget(text: str, budget: int) -> str:
-    if _count_tokens(text) <= budget:
+    if count_tokens(text) <= budget:
         return text
     chars_budget = int(budget / TOKENS_PER_CHAR)
     cut = text[:chars_budget]
@@ -31,6 +50,43 @@ def _truncate_to_budget(text: str, budget: int) -> str:
     logger.debug(f"[DEBUG] Truncated chunk from {len(text)} chars to {len(truncated)} chars")
     return truncated
 
+def split_quota(total: int, weights: List[int]) -> List[int]:
+    """
+    Split `total` across items in proportion to `weights`. Cumulative
+    rounding keeps each share within one of its exact value and, when there
+    are more items than units, spreads the units evenly along the list
+    instead of giving them all to the first items.
+    """
+    if not weights:
+        return []
+    weight_sum = sum(weights)
+    if weight_sum <= 0:
+        weights, weight_sum = [1] * len(weights), len(weights)
+    quota, seen, cumulative = [], 0, 0
+    for w in weights:
+        cumulative += w
+        reached = (2 * total * cumulative + weight_sum) // (2 * weight_sum)  # round(total * share so far)
+        quota.append(reached - seen)
+        seen = reached
+    return quota
+
+def _pack_chunks(token_counts: List[int], budget: int) -> List[List[int]]:
+    """
+    Greedily group consecutive chunk indices so each group fits `budget` tokens.
+    """
+    packs, current, used = [], [], 0
+    for i, tokens in enumerate(token_counts):
+        cost = tokens + (count_tokens(CHUNK_SEPARATOR) if current else 0)
+        if current and used + cost > budget:
+            packs.append(current)
+            current, used = [], 0
+            cost = tokens
+        current.append(i)
+        used += cost
+    if current:
+        packs.append(current)
+    return packs
+
 def _choose_model() -> str:
     if USE_FLASH:
         model = "gemini-2.5-flash"  # fastest model for text generation
@@ -40,33 +96,51 @@ def _choose_model() -> str:
     return model
 
 
-def generate_questions(chunks_text: List[str], n_mcq: int = 5, n_short: int = 5) -> List[Dict]:
+def generate_questions(
+    chunks_text: List[str],
+    n_mcq: int = 5,
+    n_short: int = 5,
+    use_cache: bool = True,
+    on_batch: Optional[Callable[[List[Dict]], None]] = None,
+) -> List[Dict]:
     """
     Generate MCQ + short questions from text chunks.
+    `use_cache=False` skips cached responses (regenerate) but refreshes the cache.
+    `on_batch` is called with each prompt's validated questions as soon as that
+    call completes (completion order); the return value is in chunk order.
     """
     logger.debug(f"[DEBUG] generate_questions called with {len(chunks_text)} chunks.")
     if not chunks_text:
         logger.debug("[DEBUG] No chunks passed, returning fallback questions.")
-        return create_fallback_questions(n_mcq, n_short, [])
+        fallback = create_fallback_questions(n_mcq, n_short, [])
+        if on_batch:
+            on_batch(fallback)
+        return fallback
 
     if COMPRESS_FIRST:
         logger.debug("[DEBUG] Running summarisation pass on chunks.")
         summary = _summarise_chunks(chunks_text)
         chunks_text = [summary]
 
-    num_chunks = len(chunks_text)
-    mcq_per_chunk, mcq_rem = divmod(n_mcq, num_chunks)
-    short_per_chunk, short_rem = divmod(n_short, num_chunks)
+    # Pack consecutive chunks into as few prompts as the token budget allows;
+    # quotas are split per chunk in proportion to its size, then summed per pack
+    budget = CHUNK_MAX_TOKENS - PROMPT_OVERHEAD_TOKENS
+    contexts = [_truncate_to_budget(chunk, budget) for chunk in chunks_text]
+    token_counts = [count_tokens(c) for c in contexts]
+    mcq_quota = split_quota(n_mcq, token_counts)
+    short_quota = split_quota(n_short, token_counts)
+    packs = _pack_chunks(token_counts, budget)
 
-    all_questions = []
-    for idx, chunk in enumerate(chunks_text):
-        this_mcq = mcq_per_chunk + (1 if idx < mcq_rem else 0)
-        this_short = short_per_chunk + (1 if idx < short_rem else 0)
+    prompts = []
+    for pack_idx, pack in enumerate(packs):
+        this_mcq = sum(mcq_quota[i] for i in pack)
+        this_short = sum(short_quota[i] for i in pack)
         if this_mcq == this_short == 0:
             continue
 
-        context = _truncate_to_budget(chunk, CHUNK_MAX_TOKENS)
-        logger.debug(f"[DEBUG] Generating {this_mcq} MCQ and {this_short} short questions from chunk {idx+1}/{num_chunks}")
+        context = CHUNK_SEPARATOR.join(contexts[i] for i in pack)
+        logger.debug(f"[DEBUG] Generating {this_mcq} MCQ and {this_short} short questions from chunks "
+                     f"{pack[0]+1}-{pack[-1]+1} (prompt {pack_idx+1}/{len(packs)})")
 
      #PROMPT FOR LLM  
         prompt = f"""
@@ -100,51 +174,94 @@ Document Content:
 
 Return only the JSON array with {this_mcq + this_short} questions total.
 """
-       
-       
-       
-       
-        raw = _call_model_with_retry(prompt)
-        parsed = _safe_parse_json_array(raw)
-        all_questions.extend(parsed)
-
-    validated = validate_questions(all_questions, n_mcq, n_short)
+        prompts.append((prompt, this_mcq, this_short))
+
+    # Fan the calls out; each batch is validated against its own quota as it
+    # completes, and the results are reassembled in chunk order
+    batches: List[List[Dict]] = [[] for _ in prompts]
+    if prompts:
+        workers = max(1, min(settings.llm_max_concurrency, len(prompts)))
+        logger.debug(f"[DEBUG] Sending {len(prompts)} prompts with concurrency {workers}")
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(_call_model_with_retry, prompt, use_cache=use_cache): idx
+                for idx, (prompt, _, _) in enumerate(prompts)
+            }
+            for future in as_completed(futures):
+                idx = futures[future]
+                _, this_mcq, this_short = prompts[idx]
+                batches[idx] = validate_questions(_safe_parse_json_array(future.result()), this_mcq, this_short)
+                if on_batch and batches[idx]:
+                    on_batch(batches[idx])
+
+    validated = [q for batch in batches for q in batch]
     if not validated:
         logger.debug("[DEBUG] Model returned no valid questions, falling back.")
         validated = create_fallback_questions(n_mcq, n_short, chunks_text)
+        if on_batch:
+            on_batch(validated)
     logger.debug(f"[DEBUG] Returning {len(validated)} validated questions.")
     return validated
 
-def _call_model_with_retry(prompt: str, max_retry: int = 3) -> str:
+def _call_model_with_retry(prompt: str, max_retry: int = 3, use_cache: bool = True) -> str:
     model_name = _choose_model()
-    model = genai.GenerativeModel(model_name)
+    cache = get_response_cache()
+    if cache is None:
+        return _call_model_uncached(model_name, prompt, max_retry)
+    key = cache_key(f"{get_provider().name}:{model_name}", prompt, GENERATION_PARAMS)
+    return cache.get_or_compute(
+        key,
+        lambda: _call_model_uncached(model_name, prompt, max_retry),
+        bypass=not use_cache,
+        should_store=lambda r: bool(r) and not isinstance(r, PartialResponse),
+    )
+
+class PartialResponse(str):
+    """
+    Output salvaged from a stream that failed part-way; never cached.
+    """
+
+def _call_model_uncached(model_name: str, prompt: str, max_retry: int = 3) -> str:
+    provider = get_provider()
+    prompt_tokens = count_tokens(prompt)
     for attempt in range(1, max_retry + 1):
+        if attempt > 1:
+            LLM_RETRIES.labels(provider.name).inc()
+        pieces = []
+        started = time.perf_counter()
         try:
-            logger.debug(f"[DEBUG] Gemini call attempt {attempt}")
-            response = model.generate_content(prompt)
-            logger.debug(f"[DEBUG] Gemini responded with {len(response.text)} chars")
-            return response.text.strip()
+            logger.debug(f"[DEBUG] {provider.name} call attempt {attempt}")
+            for piece in provider.stream(prompt, model_name, **GENERATION_PARAMS):
+                pieces.append(piece)
+            text = "".join(pieces)
+            logger.debug(f"[DEBUG] {provider.name} responded with {len(text)} chars")
+            observe_llm_call(provider.name, "ok", time.perf_counter() - started, prompt_tokens, count_tokens(text))
+            return text.strip()
         except Exception as e:
-            logger.exception(f"[DEBUG] Gemini API error: {e}")
-            if "429" in str(e):
-                wait = 5 * (2 ** (attempt - 1))
+            elapsed = time.perf_counter() - started
+            logger.exception(f"[DEBUG] {provider.name} API error: {e}")
+            partial = "".join(pieces)
+            if partial and parse_json_objects(partial):
+                # keep the complete questions already received instead of paying for a retry
+                logger.debug(f"[DEBUG] Salvaged {len(partial)} chars from interrupted stream")
+                observe_llm_call(provider.name, "partial", elapsed, prompt_tokens, count_tokens(partial))
+                return PartialResponse(partial.strip())
+            if isinstance(e, RateLimitError) or "429" in str(e):
+                observe_llm_call(provider.name, "rate_limited", elapsed, prompt_tokens, count_tokens(partial))
+                wait = settings.llm_retry_base_delay * (2 ** (attempt - 1))
                 logger.debug(f"[DEBUG] Rate limited, sleeping {wait}s")
                 time.sleep(wait)
             else:
+                observe_llm_call(provider.name, "error", elapsed, prompt_tokens, count_tokens(partial))
                 break
     return ""
 
 def _safe_parse_json_array(text: str) -> List[Dict]:
-    m = re.search(r'\[.*\]', text, re.DOTALL)
-    if not m:
-        logger.debug("[DEBUG] No JSON array found in model output.")
-        return []
-    try:
-        data = json.loads(m.group(0))
-        return data if isinstance(data, list) else []
-    except json.JSONDecodeError:
-        logger.debug("[DEBUG] JSON decode error in model output.")
-        return []
+    # object-by-object, so one malformed element does not discard the batch
+    data = parse_json_objects(text)
+    if not data:
+        logger.debug("[DEBUG] No JSON objects found in model output.")
+    return data
 
 def _summarise_chunks(chunks: List[str]) -> str:
     merged = "\n".join(chunks)
@@ -158,11 +275,13 @@ def validate_questions(questions: List[Dict], n_mcq: int, n_short: int) -> List[
     validated = []
     mcq_count = short_count = 0
     for q in questions:
-        if not isinstance(q, dict):
+        # salvaged objects can lack keys or hold nulls; skip rather than raise
+        if not isinstance(q, dict) or not isinstance(q.get("question"), str) or not q["question"].strip():
             continue
-        q_type = q.get("type", "").lower()
+        q_type = str(q.get("type") or "").lower()
         if q_type == "mcq" and mcq_count < n_mcq:
-            opts = [str(o).strip() for o in q.get("options", [])][:4]
+            options = q.get("options")
+            opts = [str(o).strip() for o in options][:4] if isinstance(options, list) else []
             if len(opts) >= 2:
                 for i, o in enumerate(opts):
                     if not re.match(r"^[A-D]\)", o):
@@ -0,0 +1,168 @@
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+
+from app.config.settings import settings
+
+STUB_STREAM_PIECES = 8
+
+
+class RateLimitError(Exception):
+    """
+    Provider-neutral quota / HTTP 429 error.
+    """
+
+
+class LLMProvider:
+    """
+    Interface every text-generation backend implements.
+    """
+
+    name = "base"
+
+    def generate(self, prompt: str, model: str, **params) -> str:
+        raise NotImplementedError
+
+    def stream(self, prompt: str, model: str, **params) -> Iterator[str]:
+        """
+        Yield the response in pieces as they arrive (default: one piece).
+        """
+        yield self.generate(prompt, model, **params)
+
+
+class GeminiProvider(LLMProvider):
+    name = "gemini"
+
+    def __init__(self):
+        import google.generativeai as genai
+        from google.api_core.exceptions import ResourceExhausted
+
+        genai.configure(api_key=settings.gemini_api_key)
+        self._genai = genai
+        self._rate_limited = ResourceExhausted
+
+    def generate(self, prompt: str, model: str, **params) -> str:
+        try:
+            response = self._genai.GenerativeModel(model).generate_content(prompt, **params)
+        except self._rate_limited as e:
+            raise RateLimitError(f"429 {e}") from e
+        return response.text
+
+    def stream(self, prompt: str, model: str, **params) -> Iterator[str]:
+        try:
+            for chunk in self._genai.GenerativeModel(model).generate_content(prompt, stream=True, **params):
+                yield chunk.text
+        except self._rate_limited as e:
+            raise RateLimitError(f"429 {e}") from e
+
+
+class StubProvider(LLMProvider):
+    """
+    Offline stand-in for benchmarking: sleeps `latency_ms`, fails with a
+    RateLimitError at `failure_rate`, and otherwise returns a well-formed JSON
+    array with the question counts the prompt asks for, built from sentences of
+    the prompt's document content. Output is deterministic per prompt.
+    """
+
+    name = "stub"
+
+    def __init__(self, latency_ms: int = 200, failure_rate: float = 0.0):
+        self.latency_ms = latency_ms
+        self.failure_rate = failure_rate
+        self._rng = random.Random()
+        self._lock = threading.Lock()
+
+    def generate(self, prompt: str, model: str, **params) -> str:
+        time.sleep(self.latency_ms / 1000)
+        with self._lock:
+            failed = self._rng.random() < self.failure_rate
+        if failed:
+            raise RateLimitError("429 Resource exhausted (stub)")
+
+        n_mcq = _requested(prompt, r"(\d+) multiple choice questions", 5)
+        n_short = _requested(prompt, r"(\d+) short answer questions", 3)
+        rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).digest())
+        sentences = _sentences(_document_content(prompt))
+        words = sorted({w for s in sentences for w in re.findall(r"[A-Za-z]{5,}", s)}) or ["content"]
+        return json.dumps(
+            [_stub_mcq(sentences, words, i, rng) for i in range(n_mcq)]
+            + [_stub_short(sentences, i) for i in range(n_short)]
+        )
+
+    def stream(self, prompt: str, model: str, **params) -> Iterator[str]:
+        text = self.generate(prompt, model, **params)
+        step = max(1, len(text) // STUB_STREAM_PIECES)
+        for i in range(0, len(text), step):
+            yield text[i:i + step]
+
+
+def _requested(prompt: str, pattern: str, default: int) -> int:
+    m = re.search(pattern, prompt)
+    return int(m.group(1)) if m else default
+
+
+def _document_content(prompt: str) -> str:
+    _, _, content = prompt.partition("Document Content:")
+    return content.rsplit("Return", 1)[0] if content else prompt
+
+
+def _sentences(text: str) -> List[str]:
+    parts = [s.strip() for s in re.split(r"(?<=[.!?])\s+|\n+", text)]
+    return [s for s in parts if len(s.split()) >= 4] or ["The document has no extractable sentences."]
+
+
+def _stub_mcq(sentences: List[str], words: List[str], i: int, rng: random.Random) -> Dict:
+    sentence = sentences[i % len(sentences)]
+    candidates = re.findall(r"[A-Za-z]{5,}", sentence) or [words[0]]
+    correct = candidates[rng.randrange(len(candidates))]
+    distractors = [w for w in rng.sample(words, min(len(words), 6)) if w != correct][:3]
+    while len(distractors) < 3:
+        distractors.append(f"None of the above ({len(distractors) + 1})")
+    choices = [correct] + distractors
+    rng.shuffle(choices)
+    options = [f"{chr(65 + j)}) {c}" for j, c in enumerate(choices)]
+    blanked = sentence.replace(correct, "_____", 1)
+    return {
+        "type": "mcq",
+        "question": f"Which word completes this statement from the document: \"{blanked}\"?",
+        "options": options,
+        "answer": options[choices.index(correct)],
+    }
+
+
+def _stub_short(sentences: List[str], i: int) -> Dict:
+    sentence = sentences[(i * 7 + 3) % len(sentences)]
+    topic = " ".join(sentence.split()[:4])
+    return {
+        "type": "short",
+        "question": f"What does the document state about \"{topic}\"?",
+        "answer": sentence,
+    }
+
+
+_provider: Optional[LLMProvider] = None
+_provider_lock = threading.Lock()
+
+
+def get_provider() -> LLMProvider:
+    """
+    The configured provider (settings.llm_provider), created once per process.
+    """
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                if settings.llm_provider == "gemini":
+                    _provider = GeminiProvider()
+                elif settings.llm_provider == "stub":
+                    _provider = StubProvider(
+                        latency_ms=settings.llm_stub_latency_ms,
+                        failure_rate=settings.llm_stub_failure_rate,
+                    )
+                else:
+                    raise ValueError(f"Unknown LLM provider: {settings.llm_provider}")
+    return _provider
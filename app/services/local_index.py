@@ -0,0 +1,341 @@
+import json
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+MANIFEST_FILE = "manifest.json"
+LOCK_FILE = ".lock"
+SEGMENTS_DIR = "segments"
+MAX_SEGMENTS = 32           # compact into one segment past this many
+LEGACY_VECTORS_FILE = "vectors.npy"
+LEGACY_META_FILE = "meta.json"
+MIN_CAPACITY = 1024
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class LocalVectorIndex:
+    """
+    In-process cosine index over a contiguous float32 matrix.
+
+    Rows are L2-normalised on insert so a query is a single matrix product.
+    Each document owns one or more contiguous row ranges, so document-scoped
+    queries only touch that document's rows.
+
+    On disk the index is an append log: each `save` writes only the rows
+    changed since the previous one as a segment (`segments/<name>.npy` +
+    `.json`), then commits it by atomically replacing `manifest.json`, which
+    lists the live segments in order. Segments not in the manifest are ignored.
+    Saves from several processes are serialised by a lock file, and `refresh`
+    applies segments other processes have committed since.
+    """
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self._matrix = np.zeros((MIN_CAPACITY, dim), dtype=np.float32)
+        self._size = 0
+        self._ids: List[str] = []
+        self._metadata: List[Dict] = []
+        self._row_of: Dict[str, int] = {}
+        self._doc_ranges: Dict[str, List[List[int]]] = {}
+        self._dirty_rows = set()
+        self._segments: List[str] = []
+        self._stamp = None
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def lock(self) -> threading.RLock:
+        """
+        Held across multi-step reads so a concurrent `refresh` can't renumber rows in between.
+        """
+        return self._lock
+
+    def _reserve(self, extra: int):
+        needed = self._size + extra
+        capacity = self._matrix.shape[0]
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        grown = np.zeros((capacity, self.dim), dtype=np.float32)
+        grown[:self._size] = self._matrix[:self._size]
+        self._matrix = grown
+
+    def _add_range(self, document_id: str, start: int, end: int):
+        ranges = self._doc_ranges.setdefault(document_id, [])
+        if ranges and ranges[-1][1] == start:
+            ranges[-1][1] = end
+        else:
+            ranges.append([start, end])
+
+    def upsert(self, ids: Sequence[str], vectors, metadata: Sequence[Dict]):
+        """
+        Insert or overwrite rows. Existing ids are updated in place, new ids are
+        appended as one contiguous block.
+        """
+        self._upsert(ids, vectors, metadata, track=True)
+
+    def _upsert(self, ids: Sequence[str], vectors, metadata: Sequence[Dict], track: bool):
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(len(ids), self.dim)
+        matrix = _normalize(matrix)
+        with self._lock:
+            existing = [(i, self._row_of[cid]) for i, cid in enumerate(ids) if cid in self._row_of]
+            if existing:
+                src, dst = zip(*existing)
+                self._matrix[list(dst)] = matrix[list(src)]
+                for i, row in existing:
+                    self._metadata[row] = dict(metadata[i])
+                if track:
+                    self._dirty_rows.update(dst)
+
+            new = [i for i, cid in enumerate(ids) if cid not in self._row_of]
+            if not new:
+                return
+            self._reserve(len(new))
+            start = self._size
+            self._matrix[start:start + len(new)] = matrix[new]
+            for offset, i in enumerate(new):
+                row = start + offset
+                meta = dict(metadata[i])
+                self._ids.append(ids[i])
+                self._metadata.append(meta)
+                self._row_of[ids[i]] = row
+                self._add_range(meta.get("document_id", ""), row, row + 1)
+            self._size += len(new)
+            if track:
+                self._dirty_rows.update(range(start, start + len(new)))
+
+    def rows_for_document(self, document_id: str) -> np.ndarray:
+        with self._lock:
+            ranges = self._doc_ranges.get(document_id, [])
+            if not ranges:
+                return np.empty(0, dtype=np.int64)
+            return np.concatenate([np.arange(s, e) for s, e in ranges])
+
+    def rows_for_ids(self, ids: Sequence[str]) -> np.ndarray:
+        with self._lock:
+            return np.array([self._row_of[i] for i in ids if i in self._row_of], dtype=np.int64)
+
+    def vectors(self, rows: np.ndarray) -> np.ndarray:
+        return self._matrix[rows]
+
+    def metadata(self, row: int) -> Dict:
+        return self._metadata[row]
+
+    def chunk_id(self, row: int) -> str:
+        return self._ids[row]
+
+    def query(self, queries, top_k: int = 5, document_id: Optional[str] = None) -> List[List[Tuple[int, float]]]:
+        """
+        Batched cosine top-k. `queries` is (q, dim) or (dim,); returns, per query,
+        a list of (row, score) sorted by descending score.
+        """
+        q = np.asarray(queries, dtype=np.float32)
+        if q.ndim == 1:
+            q = q[None, :]
+        q = _normalize(q)
+
+        with self._lock:
+            if document_id is None:
+                rows = None
+                candidates = self._matrix[:self._size]
+            else:
+                ranges = self._doc_ranges.get(document_id, [])
+                if len(ranges) == 1:
+                    s, e = ranges[0]
+                    rows = np.arange(s, e)
+                    candidates = self._matrix[s:e]
+                else:
+                    rows = self.rows_for_document(document_id)
+                    candidates = self._matrix[rows]
+
+        n = candidates.shape[0]
+        if n == 0 or top_k <= 0:
+            return [[] for _ in range(q.shape[0])]
+
+        scores = q @ candidates.T
+        k = min(top_k, n)
+        if k < n:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(n), (q.shape[0], n))
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        if rows is not None:
+            top = rows[top]
+        return [list(zip(r.tolist(), s.tolist())) for r, s in zip(top, top_scores)]
+
+    def _write_segment(self, directory: Path, rows: List[int]) -> str:
+        name = f"seg-{uuid.uuid4().hex}"
+        segments = directory / SEGMENTS_DIR
+        segments.mkdir(parents=True, exist_ok=True)
+        with open(segments / f"{name}.npy", "wb") as f:
+            np.save(f, self._matrix[rows])
+        with open(segments / f"{name}.json", "w", encoding="utf-8") as f:
+            json.dump({"ids": [self._ids[r] for r in rows], "metadata": [self._metadata[r] for r in rows]}, f)
+        return name
+
+    def _apply_segment(self, directory: Path, name: str):
+        vectors = np.load(directory / SEGMENTS_DIR / f"{name}.npy")
+        with open(directory / SEGMENTS_DIR / f"{name}.json", encoding="utf-8") as f:
+            meta = json.load(f)
+        if len(meta["ids"]):
+            self._upsert(meta["ids"], vectors, meta["metadata"], track=False)
+        self._segments.append(name)
+
+    def refresh(self, path: str) -> bool:
+        """
+        Apply segments committed (by any process) since this index last read
+        the manifest; rebuilds if another process compacted. Costs one stat()
+        when nothing changed. Returns whether anything was read.
+        """
+        directory = Path(path)
+        rebuild = False
+        for _ in range(3):
+            stamp = _manifest_stamp(directory)
+            if stamp is None or stamp == self._stamp:
+                return False
+            try:
+                with self._lock:
+                    manifest = _read_manifest(directory)
+                    if manifest["dim"] != self.dim:
+                        raise ValueError(f"Local index at {path} has dim {manifest['dim']}, expected {self.dim}")
+                    live = manifest["segments"]
+                    if not rebuild and live[:len(self._segments)] == self._segments:
+                        for name in live[len(self._segments):]:
+                            self._apply_segment(directory, name)
+                    else:
+                        self._rebuild(directory, live)
+                    self._stamp = stamp
+                return True
+            except FileNotFoundError:
+                # a compaction removed segments of the manifest just read
+                # (possibly after some were applied): start over from scratch
+                rebuild = True
+        raise RuntimeError(f"Local index at {path} kept changing while being read")
+
+    def _rebuild(self, directory: Path, live: List[str]):
+        # reload from the manifest, then re-apply rows not saved yet
+        pending = sorted(self._dirty_rows)
+        unsaved = ([self._ids[r] for r in pending], self._matrix[pending], [self._metadata[r] for r in pending])
+        fresh = LocalVectorIndex(self.dim)
+        for name in live:
+            fresh._apply_segment(directory, name)
+        if pending:
+            fresh.upsert(*unsaved)
+        for attr in ("_matrix", "_size", "_ids", "_metadata", "_row_of", "_doc_ranges", "_dirty_rows", "_segments"):
+            setattr(self, attr, getattr(fresh, attr))
+
+    def save(self, path: str):
+        """
+        Persist the rows changed since the last save as a new segment; past
+        `MAX_SEGMENTS` the whole index is rewritten as one. The manifest is
+        replaced last, so a crash part-way leaves the previous state intact.
+        """
+        directory = Path(path)
+        directory.mkdir(parents=True, exist_ok=True)
+        if not self._dirty_rows and (directory / MANIFEST_FILE).exists():
+            return
+        with _file_lock(directory), self._lock:
+            # segments other processes committed must stay in the manifest (and in a compaction)
+            self.refresh(path)
+            obsolete = []
+            if len(self._segments) >= MAX_SEGMENTS:
+                obsolete, self._segments = self._segments, []
+                rows = list(range(self._size))
+            else:
+                rows = sorted(self._dirty_rows)
+            self._segments.append(self._write_segment(directory, rows))
+            _write_manifest(directory, {"dim": self.dim, "segments": self._segments})
+            self._stamp = _manifest_stamp(directory)
+            self._dirty_rows.clear()
+        for name in obsolete:
+            for suffix in (".npy", ".json"):
+                (directory / SEGMENTS_DIR / f"{name}{suffix}").unlink(missing_ok=True)
+
+    @classmethod
+    def load(cls, path: str, dim: int) -> "LocalVectorIndex":
+        """
+        Load an index saved with `save`, or return an empty one if none exists.
+        A pre-segment `vectors.npy` + `meta.json` pair is read and rewritten as
+        a segment on the next save.
+        """
+        index = cls(dim)
+        directory = Path(path)
+        if index.refresh(path):
+            return index
+
+        if not (directory / LEGACY_VECTORS_FILE).exists() or not (directory / LEGACY_META_FILE).exists():
+            return index
+        with open(directory / LEGACY_META_FILE, encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["dim"] != dim:
+            raise ValueError(f"Local index at {path} has dim {meta['dim']}, expected {dim}")
+        matrix = np.load(directory / LEGACY_VECTORS_FILE)
+        if len(matrix) != len(meta["ids"]):
+            raise ValueError(f"Local index at {path} is inconsistent: {len(matrix)} vectors, {len(meta['ids'])} ids")
+        if len(matrix):
+            index.upsert(meta["ids"], matrix, meta["metadata"])
+        return index
+
+
+def _read_manifest(directory: Path) -> Optional[Dict]:
+    try:
+        with open(directory / MANIFEST_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_manifest(directory: Path, manifest: Dict):
+    tmp = directory / (MANIFEST_FILE + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, directory / MANIFEST_FILE)
+
+
+def _manifest_stamp(directory: Path):
+    # the manifest is replaced, never edited, so inode + mtime + size identify a version
+    try:
+        st = os.stat(directory / MANIFEST_FILE)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+@contextmanager
+def _file_lock(directory: Path):
+    """
+    Exclusive cross-process lock on `directory` for the duration of a save.
+    """
+    with open(directory / LOCK_FILE, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
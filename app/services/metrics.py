@@ -0,0 +1,140 @@
+"""
+Prometheus metrics for every pipeline stage, exposed on `/metrics`.
+
+Recording is a counter increment or histogram observation (no I/O) and
+happens per page, batch, call or request, never per token or row. When the
+API and the Celery workers should report together, point
+`PROMETHEUS_MULTIPROC_DIR` at a shared, empty directory in every process;
+`render_metrics` then aggregates all of them.
+"""
+import os
+import time
+from typing import Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import REGISTRY, multiprocess
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+SLOW_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+DB_OPERATIONS = frozenset(("select", "insert", "update", "delete", "pragma", "begin", "commit", "rollback"))
+
+# --- ingestion ---
+EXTRACTION_PAGES = Counter("ragquiz_extraction_pages_total", "PDF pages extracted", ["engine"])
+EXTRACTION_PAGE_SECONDS = Histogram(
+    "ragquiz_extraction_page_seconds", "Text extraction time per page", ["engine"], buckets=FAST_BUCKETS
+)
+CHUNKS = Counter("ragquiz_chunks_total", "Chunks produced by ingestion")
+EMBEDDING_BATCH_SECONDS = Histogram(
+    "ragquiz_embedding_batch_seconds", "get_embeddings time per batch", buckets=FAST_BUCKETS
+)
+EMBEDDING_TEXTS = Counter("ragquiz_embedding_texts_total", "Texts embedded (not served from the cache)")
+VECTOR_STORE_SECONDS = Histogram(
+    "ragquiz_vector_store_seconds", "Vector store operation time", ["backend", "operation"], buckets=FAST_BUCKETS
+)
+INGESTION_SECONDS = Histogram(
+    "ragquiz_ingestion_seconds", "End-to-end document ingestion time", ["status"], buckets=SLOW_BUCKETS
+)
+
+# --- generation ---
+LLM_REQUEST_SECONDS = Histogram(
+    "ragquiz_llm_request_seconds", "LLM call time per attempt", ["provider", "outcome"], buckets=SLOW_BUCKETS
+)
+LLM_RETRIES = Counter("ragquiz_llm_retries_total", "LLM call attempts after the first", ["provider"])
+LLM_RATE_LIMITED = Counter("ragquiz_llm_rate_limited_total", "LLM calls rejected with 429 / quota", ["provider"])
+LLM_TOKENS = Counter(
+    "ragquiz_llm_tokens_total", "Estimated LLM tokens (chars * TOKENS_PER_CHAR)", ["provider", "direction"]
+)
+GENERATION_JOB_SECONDS = Histogram(
+    "ragquiz_generation_job_seconds", "Question generation job time", ["status"], buckets=SLOW_BUCKETS
+)
+QUESTIONS_SAVED = Counter("ragquiz_questions_saved_total", "Generated questions stored")
+QUESTIONS_REJECTED = Counter("ragquiz_questions_rejected_total", "Generated questions not stored")
+
+# --- serving ---
+CACHE_REQUESTS = Counter("ragquiz_cache_requests_total", "Cache lookups", ["cache", "result"])
+QUIZ_ANSWERS = Counter("ragquiz_quiz_answers_total", "Graded quiz answers", ["result"])
+DB_QUERY_SECONDS = Histogram(
+    "ragquiz_db_query_seconds", "SQL statement execution time", ["operation"], buckets=FAST_BUCKETS
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "ragquiz_http_request_seconds", "HTTP request time", ["method", "route", "status"], buckets=FAST_BUCKETS
+)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """
+    (body, content type) for a scrape; merges every process's samples in
+    multiprocess mode.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def observe_llm_call(provider: str, outcome: str, seconds: float, prompt_tokens: int, response_tokens: int = 0):
+    """
+    Record one LLM call attempt: outcome is ok / partial / rate_limited / error.
+    """
+    LLM_REQUEST_SECONDS.labels(provider, outcome).observe(seconds)
+    LLM_TOKENS.labels(provider, "prompt").inc(prompt_tokens)
+    if response_tokens:
+        LLM_TOKENS.labels(provider, "response").inc(response_tokens)
+    if outcome == "rate_limited":
+        LLM_RATE_LIMITED.labels(provider).inc()
+
+
+def _db_operation(statement: str) -> str:
+    words = statement.split(None, 1)
+    operation = words[0].lower() if words else ""
+    return operation if operation in DB_OPERATIONS else "other"
+
+
+def instrument_engine(engine: Engine):
+    """
+    Time every statement run on `engine`, labelled by its leading keyword.
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_metrics_started", None)
+        if started is not None:
+            DB_QUERY_SECONDS.labels(_db_operation(statement)).observe(time.perf_counter() - started)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request by route template, so
+    `/questions/{document_id}` is one series however many documents exist.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = ["500"]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = str(message["status"])
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(
+                scope["method"], getattr(route, "path", "unmatched"), status[0]
+            ).observe(time.perf_counter() - started)
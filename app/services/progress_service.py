@@ -12,6 +12,8 @@ def get_progress_for_document(db: Session, document_id: str) -> dict:
         "document_id": document_id,
         "status": doc.status,
         "processing_started_at": doc.processing_started_at,
+        "attempts": doc.ingestion_attempts or 0,
+        "error": doc.ingestion_error,
         "updated_at": doc.updated_at,
     }
 
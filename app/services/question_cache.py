@@ -0,0 +1,104 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config.settings import settings
+from app.models.question import Question
+from app.services.grading import compile_answer_key
+from app.services.metrics import CACHE_REQUESTS
+
+_HITS = CACHE_REQUESTS.labels("question_set", "hit")
+_MISSES = CACHE_REQUESTS.labels("question_set", "miss")
+
+
+class QuestionSet:
+    """
+    Immutable snapshot of one document's questions, in quiz order.
+    `records` are `Question.to_dict()` dicts and must not be mutated;
+    `json` is the pre-encoded records array for list responses and
+    `answer_keys` maps id -> (type, answer_key, answer_index) for grading.
+    """
+
+    __slots__ = ("records", "by_id", "json", "answer_keys")
+
+    def __init__(self, questions: List[Question]):
+        self.records = tuple(q.to_dict() for q in questions)
+        self.by_id = {r["id"]: r for r in self.records}
+        self.json = json.dumps(list(self.records), default=str).encode("utf-8")
+        self.answer_keys = {}
+        for q in questions:
+            if q.answer_key is None:
+                # saved before keys were precomputed
+                key, index = compile_answer_key(q.question_type, q.options, q.answer)
+            else:
+                key, index = q.answer_key, q.answer_index
+            self.answer_keys[str(q.id)] = (q.question_type, key, index)
+
+
+class QuestionSetCache:
+    """
+    Read-through, per-document cache of question sets with LRU eviction past
+    `max_documents` and a `ttl_seconds` bound on staleness (other processes
+    don't see this process's invalidations).
+    """
+
+    def __init__(self, max_documents: int = 256, ttl_seconds: int = 300):
+        self.max_documents = max_documents
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, QuestionSet]]" = OrderedDict()
+        # bumped on invalidate so a load that raced with a write is not stored
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, document_id: str) -> QuestionSet:
+        """
+        Return the question set for a (canonical) document ID, loading it on a miss.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(document_id)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(document_id)
+                self.hits += 1
+                _HITS.inc()
+                return entry[1]
+            self.misses += 1
+            _MISSES.inc()
+            version = self._versions.get(document_id, 0)
+
+        rows = (
+            db.query(Question)
+            .filter(Question.document_id == document_id)
+            .order_by(Question.created_at, Question.id)
+            .all()
+        )
+        question_set = QuestionSet(rows)
+
+        with self._lock:
+            if self._versions.get(document_id, 0) == version:
+                self._entries[document_id] = (now + self.ttl_seconds, question_set)
+                self._entries.move_to_end(document_id)
+                while len(self._entries) > self.max_documents:
+                    self._entries.popitem(last=False)
+        return question_set
+
+    def invalidate(self, document_id: str):
+        with self._lock:
+            self._entries.pop(document_id, None)
+            self._versions[document_id] = self._versions.get(document_id, 0) + 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "documents": len(self._entries)}
+
+
+question_cache = QuestionSetCache(
+    max_documents=settings.question_cache_max_documents,
+    ttl_seconds=settings.question_cache_ttl_seconds,
+)
@@ -1,17 +1,26 @@
 from sqlalchemy.orm import Session
-from typing import List, Dict
-import uuid
+from typing import Callable, List, Dict, Optional
 
 from app.models.question import Question
 from app.models.document import Document
+from app.config.settings import settings
 from app.services import vector_db, llm_client
+from app.services.chunk_selection import select_diverse_chunks, topic_relevance
+from app.services.document_service import canonical_document_id
+from app.services.question_writer import bulk_insert_questions
+from app.services.question_cache import QuestionSet, question_cache
+
+def get_question_set(db: Session, document_id: str) -> QuestionSet:
+    """
+    Cached, pre-serialised questions for a document (aliases resolved).
+    """
+    return question_cache.get(db, canonical_document_id(db, document_id))
 
 def list_questions_for_document(db: Session, document_id: str) -> List[Dict]:
     """
     Get all questions already generated/stored for a document.
     """
-    questions = db.query(Question).filter_by(document_id=document_id).all()
-    return [q.to_dict() for q in questions]
+    return list(get_question_set(db, document_id).records)
 
 def trigger_generate_questions(
     db: Session,
@@ -20,12 +29,18 @@ def trigger_generate_questions(
     n_match: int = 5,
     n_short: int = 5,
     regenerate: bool = False,
+    topic: Optional[str] = None,
+    on_questions: Optional[Callable[[List[Dict]], None]] = None,
 ) -> bool:
     """
     Orchestrate the generation of new questions for a document.
+    `on_questions` receives each batch of saved questions (as `to_dict()` records).
+    `topic` focuses the context on chunks matching it (hybrid BM25 + vector score).
     """
     try:
         print(f"DEBUG: Starting question generation for document: {document_id}")
+        # Aliases of a de-duplicated upload share the original's questions
+        document_id = canonical_document_id(db, document_id)
         
         doc = db.query(Document).filter_by(id=document_id).first()
         if not doc:
@@ -38,10 +53,25 @@ def trigger_generate_questions(
             print("DEBUG: Regenerating - deleting existing questions")
             db.query(Question).filter_by(document_id=document_id).delete()
             db.commit()
+            question_cache.invalidate(document_id)
 
-        # Step 1: Fetch chunks from Pinecone
-        print("DEBUG: Fetching chunks from Pinecone")
-        chunks = vector_db.fetch_chunks_for_document(document_id, top_k=10)
+        # Step 1: Fetch every chunk with its stored embedding, then pick a diverse
+        # subset by MMR so each LLM call works on distinct material
+        print("DEBUG: Fetching chunks from vector store")
+        chunks = vector_db.fetch_chunks_for_document(
+            document_id, top_k=None, chunk_ids=doc.chunk_ids, include_values=True
+        )
+        relevance = None
+        if topic and chunks and all(c.get("values") is not None for c in chunks):
+            print(f"DEBUG: Scoping chunks to topic: {topic}")
+            relevance = topic_relevance(document_id, chunks, topic, settings.hybrid_vector_weight)
+        chunks = select_diverse_chunks(
+            chunks,
+            settings.generation_chunk_count,
+            settings.generation_mmr_lambda,
+            relevance=relevance,
+            candidates=settings.generation_chunk_count * settings.topic_candidate_factor,
+        )
         
         if not chunks:
             print("DEBUG: No chunks found, creating fallback content")
@@ -49,42 +79,30 @@ def trigger_generate_questions(
 
         print(f"DEBUG: Found {len(chunks)} chunks")
 
-        # Step 2: Generate questions using LLM
+        # Step 2 + 3: Generate questions with the LLM and save each batch as soon
+        # as it has been validated, so callers can stream partial results
         print("DEBUG: Generating questions with LLM")
         chunks_text = [chunk['text'] for chunk in chunks]
-        
+        saved = []
+
+        def save_batch(batch: List[Dict]):
+            rows, _ = bulk_insert_questions(db, document_id, batch)
+            saved.extend(rows)
+            if rows and on_questions:
+                on_questions(rows)
+
         generated_questions = llm_client.generate_questions(
             chunks_text=chunks_text,
             n_mcq=n_mcq,
             n_short=n_short,
+            use_cache=not regenerate,
+            on_batch=save_batch,
         )
 
         print(f"DEBUG: Generated {len(generated_questions)} questions")
 
-        # Step 3: Save questions to database ONE BY ONE to avoid UUID issues
-        print("DEBUG: Saving questions to database")
-        saved_count = 0
-        for i, q in enumerate(generated_questions):
-            try:
-                question = Question(
-                    document_id=str(document_id),
-                    question_type=q["type"],
-                    question_text=q["question"],
-                    options=q.get("options"),
-                    answer=q.get("answer")
-                )
-                db.add(question)
-                db.flush()  # Flush individually to catch errors early
-                saved_count += 1
-                print(f"DEBUG: Saved question {i+1}/{len(generated_questions)}")
-            except Exception as e:
-                print(f"DEBUG: Error saving question {i+1}: {e}")
-                db.rollback()
-                continue
-
-        if saved_count > 0:
-            db.commit()
-            print(f"DEBUG: Successfully saved {saved_count} questions")
+        if saved:
+            print(f"DEBUG: Successfully saved {len(saved)} questions")
             return True
         else:
             print("DEBUG: No questions were saved")
@@ -0,0 +1,103 @@
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.models.question import Question
+from app.services.metrics import QUESTIONS_REJECTED, QUESTIONS_SAVED
+from app.services.question_cache import question_cache
+from app.services.grading import compile_answer_key
+
+logger = logging.getLogger(__name__)
+
+INSERT_BATCH_SIZE = 500
+
+
+def _validate(q) -> Optional[str]:
+    """
+    Return why a generated question can't be stored, or None if it can.
+    """
+    if not isinstance(q, dict):
+        return "not an object"
+    if not isinstance(q.get("type"), str) or not q["type"].strip():
+        return "missing type"
+    if not isinstance(q.get("question"), str) or not q["question"].strip():
+        return "missing question text"
+    options = q.get("options")
+    if options is not None and not (isinstance(options, list) and all(isinstance(o, str) for o in options)):
+        return "options must be a list of strings"
+    answer = q.get("answer")
+    if answer is not None and not isinstance(answer, str):
+        return "answer must be a string"
+    return None
+
+
+def bulk_insert_questions(
+    db: Session, document_id: str, questions: List[Dict]
+) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Validate and insert generated questions with one executemany per batch,
+    then commit. IDs are generated client-side so no row needs a flush.
+
+    Returns (saved, rejected): saved rows as `Question.to_dict()` records and
+    `{"index", "reason"}` entries for questions that were not stored.
+    """
+    rows, rejected = [], []
+    # explicit, strictly increasing timestamps keep the quiz's (created_at, id)
+    # order equal to generation order and stored in the driver's own format
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    for i, q in enumerate(questions):
+        reason = _validate(q)
+        if reason:
+            rejected.append({"index": i, "reason": reason})
+            continue
+        answer_key, answer_index = compile_answer_key(q["type"], q.get("options"), q.get("answer"))
+        rows.append((i, {
+            "id": uuid.uuid4(),
+            "document_id": str(document_id),
+            "question_type": q["type"],
+            "question_text": q["question"],
+            "options": q.get("options") or None,
+            "answer": q.get("answer"),
+            "answer_key": answer_key,
+            "answer_index": answer_index,
+            "created_at": now + timedelta(microseconds=i),
+        }))
+
+    saved = []
+    for start in range(0, len(rows), INSERT_BATCH_SIZE):
+        batch = rows[start:start + INSERT_BATCH_SIZE]
+        try:
+            db.execute(insert(Question), [row for _, row in batch])
+            db.commit()
+        except Exception as e:
+            # only this batch is lost; earlier batches are already committed
+            db.rollback()
+            rejected.extend({"index": i, "reason": f"insert failed: {e}"} for i, _ in batch)
+            continue
+        saved.extend(batch)
+
+    QUESTIONS_SAVED.inc(len(saved))
+    QUESTIONS_REJECTED.inc(len(rejected))
+    if saved:
+        question_cache.invalidate(str(document_id))
+    if rejected:
+        # counted in QUESTIONS_REJECTED above; the log shows the first reasons
+        logger.warning("Rejected %d/%d questions: %s", len(rejected), len(questions), rejected[:5])
+    return [_to_record(row) for _, row in saved], rejected
+
+
+def _to_record(row: Dict) -> Dict:
+    # same shape as Question.to_dict(), without reloading the row
+    return {
+        "id": str(row["id"]),
+        "document_id": row["document_id"],
+        "type": row["question_type"],
+        "question_text": row["question_text"],
+        "options": row["options"],
+        "answer": row["answer"],
+        "metadata": None,
+    }
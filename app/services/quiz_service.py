@@ -1,34 +1,85 @@
+from sqlalchemy import insert, literal, tuple_, update
 from sqlalchemy.orm import Session
+from app.models.attempt import QuestionAttempt
 from app.models.progress import UserProgress
 from app.models.question import Question
 from app.models.document import Document
-from typing import Optional, Dict
+from app.services.document_service import canonical_document_id
+from app.services.question_cache import QuestionSet, question_cache
+from app.services.grading import is_correct
+from app.services.metrics import QUIZ_ANSWERS
+from typing import Optional, Dict, List
 import uuid
-import json
+
+
+def _parse_uuid(value) -> Optional[uuid.UUID]:
+    try:
+        return value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
+    except ValueError:
+        return None
+
+
+def _question_set_with(db: Session, document_id: str, question_ids: List[uuid.UUID]) -> QuestionSet:
+    """
+    The cached question set, reloaded at most once, and only if some of
+    `question_ids` are missing from it but do exist in the database (inserted
+    after the set was cached, e.g. by another worker). Unknown IDs cost one
+    indexed lookup, not a reload.
+    """
+    question_set = question_cache.get(db, document_id)
+    missing = [q for q in question_ids if str(q) not in question_set.by_id]
+    if missing and db.query(Question.id).filter(
+        Question.document_id == document_id, Question.id.in_(missing)
+    ).first():
+        question_cache.invalidate(document_id)
+        question_set = question_cache.get(db, document_id)
+    return question_set
+
+
+def _cached_question(db: Session, document_id: str, question_id: uuid.UUID) -> Optional[Dict]:
+    return _question_set_with(db, document_id, [question_id]).by_id.get(str(question_id))
 
 
 def get_next_question_for_user(db: Session, user_id: str, document_id: str) -> Optional[dict]:
     """
     Returns the next unanswered question for a given user & document.
+
+    Walks questions in (created_at, id) order from the user's cursor, skipping
+    ones already answered out of order, then moves the cursor up to the result.
+    Progress, like attempts, is kept under the canonical document, so an alias
+    and its original share one quiz.
     """
-    progress = db.query(UserProgress).filter_by(user_id=user_id, document_id=document_id).first()
-    answered_question_ids = progress.answered_question_ids if progress else []
-
-    # Ensure all answered_question_ids are strings for comparison
-    answered_question_ids = [str(q) for q in answered_question_ids]
-
-    next_q = (
-        db.query(Question)
-        .filter(Question.document_id == document_id)
-        .filter(~Question.id.in_(answered_question_ids))
-        .order_by(Question.created_at)
-        .first()
+    canonical_id = canonical_document_id(db, document_id)
+    progress = db.query(UserProgress).filter_by(user_id=user_id, document_id=canonical_id).first()
+
+    answered = (
+        db.query(QuestionAttempt.id)
+        .filter(
+            QuestionAttempt.user_id == user_id,
+            QuestionAttempt.document_id == canonical_id,
+            QuestionAttempt.question_id == Question.id,
+        )
+        .exists()
     )
+    # only the indexed key columns are read; the record itself comes from the question cache
+    query = db.query(Question.created_at, Question.id).filter(Question.document_id == canonical_id).filter(~answered)
+    if progress and progress.cursor_created_at is not None:
+        query = query.filter(
+            tuple_(Question.created_at, Question.id)
+            >= tuple_(literal(progress.cursor_created_at, Question.created_at.type),
+                      literal(progress.cursor_question_id, Question.id.type))
+        )
+    next_q = query.order_by(Question.created_at, Question.id).first()
 
     if not next_q:
         return None  # all questions answered
 
-    return next_q.to_dict()
+    if progress and (progress.cursor_created_at, progress.cursor_question_id) != (next_q.created_at, next_q.id):
+        progress.cursor_created_at = next_q.created_at
+        progress.cursor_question_id = next_q.id
+        db.commit()
+
+    return _cached_question(db, canonical_id, next_q.id)
 
 
 def grade_answer_and_update_progress(
@@ -42,48 +93,82 @@ def grade_answer_and_update_progress(
     """
     Grade the user's answer and update progress.
     """
-    question = db.query(Question).filter_by(id=question_id, document_id=document_id).first()
-    if not question:
-        return {"success": False, "message": "Question not found."}
-
-    correct = False
-
-    if question.question_type == "mcq":
-        # user_answer expected to be {"selected_index": int}
-        selected_index = user_answer.get("selected_index")
-        if selected_index is not None and question.options and 0 <= selected_index < len(question.options):
-            selected_option = question.options[selected_index].strip().lower()
-            correct = selected_option == question.answer.strip().lower()
-
-    elif question.question_type == "short":
-        # user_answer expected to be {"text": "..."}
-        user_text = user_answer.get("text", "").strip().lower()
-        correct = user_text == question.answer.strip().lower()
-
-    else:
-        # For other types (match etc.), fallback to string compare
-        try:
-            user_text = json.dumps(user_answer).strip().lower()
-        except Exception:
-            user_text = str(user_answer).strip().lower()
-        correct = user_text == question.answer.strip().lower()
-
-    # Update user progress
-    progress = db.query(UserProgress).filter_by(user_id=user_id, document_id=document_id).first()
-    if not progress:
-        progress = UserProgress(user_id=user_id, document_id=document_id, answered_question_ids=[])
-        db.add(progress)
-
-    question_id_str = str(question_id)
-    if not progress.answered_question_ids:
-        progress.answered_question_ids = []
+    result = grade_answers_and_update_progress(
+        db, user_id, document_id,
+        [{"question_id": question_id, "answer": user_answer, "elapsed_seconds": elapsed_seconds}],
+    )
+    graded = result["results"][0]
+    if "error" in graded:
+        return {"success": False, "message": graded["error"]}
+    return {"success": True, "correct": graded["correct"], "current_score": result["current_score"]}
 
-    if question_id_str not in progress.answered_question_ids:
-        progress.answered_question_ids.append(question_id_str)
 
-    if correct:
-        progress.score = (progress.score or 0) + 1
+def grade_answers_and_update_progress(db: Session, user_id: str, document_id: str, answers: List[Dict]) -> dict:
+    """
+    Grade a batch of {"question_id", "answer", "elapsed_seconds"} items in one
+    transaction: questions and answer keys come from the question cache, the
+    user's progress and existing attempts are read once, and all attempts are
+    written with bulk statements and a single commit.
+    """
+    canonical_id = canonical_document_id(db, document_id)
+    question_uuids = [_parse_uuid(item.get("question_id")) for item in answers]
+    # IDs that aren't UUIDs can't be questions and never trigger a reload
+    question_set = _question_set_with(db, canonical_id, [q for q in question_uuids if q])
+
+    # grade first (no DB access); a repeated question_id keeps its last answer
+    graded: Dict[uuid.UUID, Dict] = {}
+    results = []
+    for item, question_uuid in zip(answers, question_uuids):
+        key = question_set.answer_keys.get(str(question_uuid)) if question_uuid else None
+        if key is None:
+            QUIZ_ANSWERS.labels("not_found").inc()
+            results.append({"question_id": item.get("question_id"), "error": "Question not found."})
+            continue
+        correct = is_correct(*key, item.get("answer") or {})
+        QUIZ_ANSWERS.labels("correct" if correct else "incorrect").inc()
+        graded[question_uuid] = {"correct": correct, "elapsed_seconds": item.get("elapsed_seconds")}
+        results.append({"question_id": str(question_uuid), "correct": correct})
+
+    # keyed like the attempts the score delta is computed from
+    progress = db.query(UserProgress).filter_by(user_id=user_id, document_id=canonical_id).first()
+    if not graded:
+        return {"success": True, "results": results, "current_score": progress.score if progress else 0}
+    if not progress:
+        progress = UserProgress(user_id=user_id, document_id=canonical_id, score=0)
+        db.add(progress)
 
+    existing = {
+        a.question_id: a
+        for a in db.query(QuestionAttempt.id, QuestionAttempt.question_id, QuestionAttempt.correct).filter(
+            QuestionAttempt.user_id == user_id,
+            QuestionAttempt.document_id == canonical_id,
+            QuestionAttempt.question_id.in_(list(graded)),
+        )
+    }
+
+    inserts, updates = [], []
+    delta = 0
+    for question_uuid, g in graded.items():
+        previous = existing.get(question_uuid)
+        if previous:
+            # re-answering replaces the earlier result instead of scoring twice
+            delta += int(g["correct"]) - int(previous.correct)
+            updates.append({"id": previous.id, **g})
+        else:
+            delta += int(g["correct"])
+            inserts.append({
+                "id": uuid.uuid4(),
+                "user_id": user_id,
+                "document_id": canonical_id,
+                "question_id": question_uuid,
+                **g,
+            })
+
+    if inserts:
+        db.execute(insert(QuestionAttempt), inserts)
+    if updates:
+        db.execute(update(QuestionAttempt), updates)
+    score = progress.score = (progress.score or 0) + delta
     db.commit()
 
-    return {"success": True, "correct": correct, "current_score": progress.score}
+    return {"success": True, "results": results, "current_score": score}
@@ -1,77 +1,268 @@
-from pinecone import Pinecone, ServerlessSpec
 from app.config.settings import settings
-from typing import List, Dict
-
-_initialized = False
-_index = None
-_pc = None
-
-def init_pinecone():
-    global _initialized, _index, _pc
-    if _initialized:
-        return
-    _pc = Pinecone(api_key=settings.pinecone_api_key)
-    
-    existing_indexes = [index_info["name"] for index_info in _pc.list_indexes()]
-    if settings.pinecone_index_name not in existing_indexes:
-        _pc.create_index(
-            name=settings.pinecone_index_name, 
-            dimension=settings.pinecone_dimension,
-            metric="cosine",
-            spec=ServerlessSpec(
-                cloud='aws',
-                region='us-east-1'
+from typing import List, Dict, Optional
+import logging
+
+import numpy as np
+
+from app.services.local_index import LocalVectorIndex
+from app.services.metrics import VECTOR_STORE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+PINECONE_FETCH_BATCH = 100
+PINECONE_MAX_TOP_K = 1_000   # Pinecone's limit when metadata or values are returned
+
+
+class VectorStore:
+    """
+    Interface every vector backend implements.
+    """
+
+    def upsert(self, vectors: List[Dict]):
+        raise NotImplementedError
+
+    def query(self, vector: List[float], top_k: int = 5, document_id: Optional[str] = None) -> List[Dict]:
+        raise NotImplementedError
+
+    def fetch(self, ids: List[str], include_values: bool = False) -> List[Dict]:
+        """
+        Fetch chunks by ID, in the order given. Unknown IDs are skipped.
+        `include_values` adds each chunk's stored embedding under 'values'.
+        """
+        raise NotImplementedError
+
+    def fetch_document(self, document_id: str, limit: Optional[int] = None, include_values: bool = False) -> List[Dict]:
+        """
+        All chunks of one document (up to `limit`), for documents without a chunk registry.
+        """
+        raise NotImplementedError
+
+    def flush(self):
+        """
+        Persist pending writes (no-op for remote backends).
+        """
+
+
+class PineconeStore(VectorStore):
+    def __init__(self):
+        from pinecone import Pinecone, ServerlessSpec
+
+        self._pc = Pinecone(api_key=settings.pinecone_api_key)
+
+        existing_indexes = [index_info["name"] for index_info in self._pc.list_indexes()]
+        if settings.pinecone_index_name not in existing_indexes:
+            self._pc.create_index(
+                name=settings.pinecone_index_name,
+                dimension=settings.pinecone_dimension,
+                metric="cosine",
+                spec=ServerlessSpec(
+                    cloud='aws',
+                    region='us-east-1'
+                )
             )
+
+        self._index = self._pc.Index(settings.pinecone_index_name)
+
+    def upsert(self, vectors: List[Dict]):
+        vector_tuples = [(v["id"], v["values"], v["metadata"]) for v in vectors]
+        self._index.upsert(vectors=vector_tuples)
+
+    def query(
+        self, vector: List[float], top_k: int = 5, document_id: Optional[str] = None, include_values: bool = False
+    ) -> List[Dict]:
+        results = self._index.query(
+            vector=vector,
+            top_k=min(top_k, PINECONE_MAX_TOP_K),
+            filter={"document_id": {"$eq": document_id}} if document_id else None,
+            include_metadata=True,
+            include_values=include_values
         )
-    
-    _index = _pc.Index(settings.pinecone_index_name)
-    _initialized = True
+
+        matches = []
+        if results and 'matches' in results:
+            for match in results['matches']:
+                metadata = match.get('metadata', {})
+                chunk = {
+                    'text': metadata.get('text_excerpt', ''),
+                    'chunk_id': metadata.get('chunk_id', ''),
+                    'score': match.get('score', 0)
+                }
+                if include_values:
+                    chunk['values'] = match.get('values')
+                matches.append(chunk)
+        return matches
+
+    def fetch(self, ids: List[str], include_values: bool = False) -> List[Dict]:
+        found = {}
+        for i in range(0, len(ids), PINECONE_FETCH_BATCH):
+            response = self._index.fetch(ids=ids[i:i + PINECONE_FETCH_BATCH])
+            found.update(response.vectors)
+
+        chunks = []
+        for chunk_id in ids:
+            vector = found.get(chunk_id)
+            if vector is None:
+                continue
+            metadata = vector.metadata or {}
+            chunk = {
+                'text': metadata.get('text_excerpt', ''),
+                'chunk_id': metadata.get('chunk_id', chunk_id),
+            }
+            if include_values:
+                chunk['values'] = vector.values
+            chunks.append(chunk)
+        return chunks
+
+    def fetch_document(self, document_id: str, limit: Optional[int] = None, include_values: bool = False) -> List[Dict]:
+        # chunk IDs are "<document_id>_c<n>": list them by prefix (paginated) and fetch by ID
+        try:
+            ids = [chunk_id for page in self._index.list(prefix=f"{document_id}_c") for chunk_id in page]
+        except Exception as e:
+            # listing is only available on serverless indexes; a query returns at most PINECONE_MAX_TOP_K
+            logger.warning("Pinecone list by prefix failed (%s), falling back to a filtered query", e)
+            dummy_vector = [0.1] * settings.pinecone_dimension
+            return self.query(
+                dummy_vector, top_k=limit or PINECONE_MAX_TOP_K, document_id=document_id, include_values=include_values
+            )
+        ids.sort(key=_chunk_position)
+        return self.fetch(ids[:limit], include_values=include_values)
+
+
+def _chunk_position(chunk_id: str):
+    _, _, position = chunk_id.rpartition("_c")
+    return (0, int(position), "") if position.isdigit() else (1, 0, chunk_id)
+
+
+class LocalStore(VectorStore):
+    """
+    NumPy-backed store persisted under `settings.local_index_path`.
+
+    Ingestion workers and the API share the directory: every read first picks
+    up segments other processes have saved (`LocalVectorIndex.refresh`).
+    """
+
+    def __init__(self):
+        self._path = settings.local_index_path
+        self._index = LocalVectorIndex.load(self._path, settings.pinecone_dimension)
+        self._dirty = False
+
+    @property
+    def index(self) -> LocalVectorIndex:
+        return self._index
+
+    def upsert(self, vectors: List[Dict]):
+        ids = [v["id"] for v in vectors]
+        values = np.asarray([v["values"] for v in vectors], dtype=np.float32)
+        self._index.upsert(ids, values, [v["metadata"] for v in vectors])
+        self._dirty = True
+
+    def _to_chunk(self, row: int, score: Optional[float] = None) -> Dict:
+        metadata = self._index.metadata(row)
+        chunk = {
+            'text': metadata.get('text_excerpt', ''),
+            'chunk_id': metadata.get('chunk_id', ''),
+        }
+        if score is not None:
+            chunk['score'] = score
+        return chunk
+
+    def query(self, vector: List[float], top_k: int = 5, document_id: Optional[str] = None) -> List[Dict]:
+        return self.query_batch([vector], top_k, document_id)[0]
+
+    def query_batch(self, vectors, top_k: int = 5, document_id: Optional[str] = None) -> List[List[Dict]]:
+        self._index.refresh(self._path)
+        with self._index.lock:
+            results = self._index.query(vectors, top_k=top_k, document_id=document_id)
+            return [[self._to_chunk(row, score) for row, score in hits] for hits in results]
+
+    def _to_chunks(self, rows: np.ndarray, include_values: bool) -> List[Dict]:
+        chunks = [self._to_chunk(row) for row in rows.tolist()]
+        if include_values:
+            # rows of one gathered matrix, so callers can stack them cheaply
+            for chunk, values in zip(chunks, self._index.vectors(rows)):
+                chunk['values'] = values
+        return chunks
+
+    def fetch(self, ids: List[str], include_values: bool = False) -> List[Dict]:
+        self._index.refresh(self._path)
+        with self._index.lock:
+            return self._to_chunks(self._index.rows_for_ids(ids), include_values)
+
+    def fetch_document(self, document_id: str, limit: Optional[int] = None, include_values: bool = False) -> List[Dict]:
+        self._index.refresh(self._path)
+        with self._index.lock:
+            return self._to_chunks(self._index.rows_for_document(document_id)[:limit], include_values)
+
+    def flush(self):
+        if self._dirty:
+            self._index.save(self._path)
+            self._dirty = False
+
+
+BACKENDS = {
+    "pinecone": PineconeStore,
+    "local": LocalStore,
+}
+
+_store: Optional[VectorStore] = None
+
+
+def init_vector_store() -> VectorStore:
+    global _store
+    if _store is None:
+        backend = settings.vector_backend
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown vector backend: {backend}")
+        _store = BACKENDS[backend]()
+    return _store
+
 
 def upsert_chunks(vectors: List[Dict]):
     """
     vectors: list of {"id": id, "values": embedding_list, "metadata": {...}}
     """
-    global _index
-    if not _initialized:
-        init_pinecone()
     if vectors:
-        vector_tuples = [(v["id"], v["values"], v["metadata"]) for v in vectors]
-        _index.upsert(vectors=vector_tuples)
+        store = init_vector_store()
+        with VECTOR_STORE_SECONDS.labels(settings.vector_backend, "upsert").time():
+            store.upsert(vectors)
 
-def fetch_chunks_for_document(document_id: str, top_k: int = 5):
+
+def query_chunks(vector: List[float], top_k: int = 5, document_id: Optional[str] = None) -> List[Dict]:
+    """
+    Cosine top-k over the configured store, optionally scoped to one document.
     """
-    Fetch chunks for a specific document from Pinecone by document_id
+    store = init_vector_store()
+    with VECTOR_STORE_SECONDS.labels(settings.vector_backend, "query").time():
+        return store.query(vector, top_k=top_k, document_id=document_id)
+
+
+def flush():
+    store = init_vector_store()
+    with VECTOR_STORE_SECONDS.labels(settings.vector_backend, "flush").time():
+        store.flush()
+
+
+def fetch_chunks_for_document(
+    document_id: str,
+    top_k: Optional[int] = 5,
+    chunk_ids: Optional[List[str]] = None,
+    include_values: bool = False,
+):
+    """
+    Fetch chunks for a specific document, in document order.
+
+    With the chunk-ID registry recorded at ingestion (`Document.chunk_ids`) the
+    chunks are fetched directly by ID; otherwise the lookup is scoped to the
+    document inside the store. `top_k=None` returns every chunk;
+    `include_values` adds the stored embeddings under 'values'.
     """
-    global _index
-    if not _initialized:
-        init_pinecone()
-    
     try:
-        # Query with a dummy vector and filter by document_id in metadata
-        dummy_vector = [0.1] * settings.pinecone_dimension
-        
-        results = _index.query(
-            vector=dummy_vector,
-            top_k=100,  # Get more results to filter
-            include_metadata=True,
-            include_values=False
-        )
-        
-        # Filter results to only include this document's chunks
-        document_chunks = []
-        if results and 'matches' in results:
-            for match in results['matches']:
-                metadata = match.get('metadata', {})
-                if metadata.get('document_id') == document_id:
-                    document_chunks.append({
-                        'text': metadata.get('text_excerpt', ''),
-                        'chunk_id': metadata.get('chunk_id', ''),
-                        'score': match.get('score', 0)
-                    })
-        
-        # Return top_k results
-        return document_chunks[:top_k] if document_chunks else []
-        
+        store = init_vector_store()
+        with VECTOR_STORE_SECONDS.labels(settings.vector_backend, "fetch").time():
+            if chunk_ids:
+                return store.fetch(list(chunk_ids)[:top_k], include_values=include_values)
+            return store.fetch_document(document_id, limit=top_k, include_values=include_values)
+
     except Exception as e:
         print(f"DEBUG: Error fetching chunks: {e}")
         # Fallback to dummy data if no real chunks found
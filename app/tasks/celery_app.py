@@ -0,0 +1,22 @@
+from celery import Celery
+from app.config.settings import settings
+
+# Broker/backend come from settings. For local runs and tests without Redis use
+# CELERY_BROKER_URL=sqla+sqlite:///./celery-broker.sqlite3 (persistent) or
+# CELERY_BROKER_URL=memory:// with CELERY_TASK_ALWAYS_EAGER=true (in-process).
+celery_app = Celery(
+    "rag_quiz",
+    broker=settings.celery_broker_url,
+    backend=settings.celery_result_backend,
+    include=["app.tasks.ingestion"],
+)
+
+celery_app.conf.update(
+    worker_concurrency=settings.ingestion_worker_concurrency,
+    # ack only after the task finishes so a worker restart re-delivers the job
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    worker_prefetch_multiplier=1,
+    task_always_eager=settings.celery_task_always_eager,
+    task_eager_propagates=False,
+)
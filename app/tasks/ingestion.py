@@ -1,55 +1,191 @@
-from app.services.extraction import extract_full_text
-from app.services.chunking import chunk_text
+import queue
+import threading
+import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator, List
+
+from app.services.extraction import iter_text_pages
+from app.services.chunking import chunk_pages
 from app.services.embeddings import get_embeddings
-from app.services.vector_db import upsert_chunks
+from app.services.vector_db import upsert_chunks, flush as flush_vectors
+from app.services.lexical_index import BM25Builder, save_document_index
+from app.services.metrics import CHUNKS, INGESTION_SECONDS
 from app.db.session import SessionLocal
 from app.models.document import Document
 from app.config.settings import settings
+from app.tasks.celery_app import celery_app
+
+_DONE = object()
+
+
+def _batched(iterable: Iterable, size: int) -> Iterator[List]:
+    it = iter(iterable)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _prefetch(iterable: Iterable, depth: int) -> Iterator:
+    """
+    Run `iterable` in a background thread, buffering at most `depth` items,
+    so the producing stage overlaps with the consuming one. If the consumer
+    stops early, the producer stops too and closes `iterable`.
+    """
+    q = queue.Queue(maxsize=max(1, depth))
+    stop = threading.Event()
+
+    def put(entry) -> bool:
+        # block only while the consumer is still reading
+        while not stop.is_set():
+            try:
+                q.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        source = iter(iterable)
+        try:
+            for item in source:
+                if not put((item, None)):
+                    return
+            put((_DONE, None))
+        except BaseException as e:
+            put((_DONE, e))
+        finally:
+            close = getattr(source, "close", None)
+            if close is not None:
+                close()
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = q.get()
+            if error is not None:
+                raise error
+            if item is _DONE:
+                return
+            yield item
+    finally:
+        stop.set()
+
+
+def _mark_status(db, document_id: str, status: str, chunk_ids: List[str] = None, error: str = None):
+    doc = db.query(Document).filter(Document.id == document_id).first()
+    if doc:
+        doc.status = status
+        if status == "processing":
+            doc.processing_started_at = datetime.now()
+            doc.ingestion_attempts = (doc.ingestion_attempts or 0) + 1
+            doc.ingestion_error = None
+        if chunk_ids is not None:
+            doc.chunk_ids = chunk_ids
+        if error is not None:
+            doc.ingestion_error = error[:2000]
+        db.add(doc)
+        db.commit()
+
 
-def start_ingestion_for_document(document_id: str, file_path: str, user_id: str):
+def start_ingestion_for_document(document_id: str, file_path: str, user_id: str, final_attempt: bool = True):
     """
-    Background task: extract text, chunk, embed, and upsert to Pinecone.
+    Background task: extract text, chunk, embed, and upsert to the vector store;
+    the full chunk text also goes into the document's BM25 index.
+
+    Runs as a staged pipeline (pages -> chunks -> embedding batches -> upsert
+    batches). Extraction and chunking run ahead in a producer thread and the
+    upsert of one batch overlaps with embedding the next; every stage holds a
+    bounded number of items, so memory does not grow with the page count.
+    An error is recorded and re-raised; the document is marked "failed" only
+    on the `final_attempt`, and "retrying" otherwise.
     """
     db = SessionLocal()
+    started = time.perf_counter()
+    status = "failed"
     try:
-        # 1) extract full text
-        full_text = extract_full_text(file_path)
+        _mark_status(db, document_id, "processing")
+
+        # 1) extract + chunk, streamed page by page
+        pages = iter_text_pages(file_path)
+        chunks = chunk_pages(pages, chunk_size=settings.chunk_size, overlap=settings.chunk_overlap)
+        chunk_batches = _prefetch(
+            _batched(chunks, settings.ingest_embed_batch_size), settings.ingest_prefetch_batches
+        )
+
+        chunk_ids = []
+        pending_vectors = []
+        lexical = BM25Builder()
+        with ThreadPoolExecutor(max_workers=1) as upserter:
+            in_flight = None
+            for batch in chunk_batches:
+                # 2) embeddings (batch)
+                CHUNKS.inc(len(batch))
+                embeddings = get_embeddings(batch)
+
+                # 3) prepare vectors
+                for text, emb in zip(batch, embeddings):
+                    chunk_id = f"{document_id}_c{len(chunk_ids)}"
+                    metadata = {"document_id": document_id, "chunk_id": chunk_id, "text_excerpt": text[:400]}
+                    pending_vectors.append({"id": chunk_id, "values": emb, "metadata": metadata})
+                    chunk_ids.append(chunk_id)
+                    lexical.add(chunk_id, text)
+
+                # 4) upsert in batches, at most one in flight
+                while len(pending_vectors) >= settings.ingest_upsert_batch_size:
+                    ready = pending_vectors[:settings.ingest_upsert_batch_size]
+                    del pending_vectors[:settings.ingest_upsert_batch_size]
+                    if in_flight is not None:
+                        in_flight.result()
+                    in_flight = upserter.submit(upsert_chunks, ready)
 
-        # 2) chunk
-        chunks = list(chunk_text(full_text, chunk_size=settings.chunk_size, overlap=settings.chunk_overlap))
-        if not chunks:
+            if in_flight is not None:
+                in_flight.result()
+            if pending_vectors:
+                upsert_chunks(pending_vectors)
+
+        if not chunk_ids:
             # mark doc failed
-            doc = db.query(Document).filter(Document.id == document_id).first()
-            if doc:
-                doc.status = "failed"
-                db.add(doc)
-                db.commit()
+            _mark_status(db, document_id, "failed", error="No extractable text")
             return
 
-        # 3) embeddings (batch)
-        embeddings = get_embeddings(chunks)
-
-        # 4) prepare vectors and upsert
-        vectors = []
-        for i, emb in enumerate(embeddings):
-            chunk_id = f"{document_id}_c{i}"
-            metadata = {"document_id": document_id, "chunk_id": chunk_id, "text_excerpt": chunks[i][:400]}
-            vectors.append({"id": chunk_id, "values": emb, "metadata": metadata})
-        upsert_chunks(vectors)
-
-        # 5) update document status
-        doc = db.query(Document).filter(Document.id == document_id).first()
-        if doc:
-            doc.status = "indexed"
-            db.add(doc)
-            db.commit()
+        flush_vectors()
+        save_document_index(document_id, lexical.build())
+
+        # 5) update document status and chunk-ID registry
+        _mark_status(db, document_id, "indexed", chunk_ids=chunk_ids)
+        status = "indexed"
     except Exception as e:
-        # mark document failed
-        doc = db.query(Document).filter(Document.id == document_id).first()
-        if doc:
-            doc.status = "failed"
-            db.add(doc)
-            db.commit()
+        # never show a terminal "failed" for an attempt that will be retried
+        _mark_status(db, document_id, "failed" if final_attempt else "retrying", error=repr(e))
         raise
     finally:
+        INGESTION_SECONDS.labels(status).observe(time.perf_counter() - started)
         db.close()
+
+
+@celery_app.task(bind=True, name="ingestion.ingest_document", max_retries=settings.ingestion_max_retries)
+def ingest_document(self, document_id: str, file_path: str, user_id: str):
+    """
+    Queued ingestion job. Failures are retried with exponential backoff;
+    the document stays "retrying" until the last attempt, then "failed".
+    Chunk IDs are deterministic, so a retry overwrites a partial upsert.
+    """
+    final_attempt = self.request.retries >= self.max_retries
+    try:
+        start_ingestion_for_document(document_id, file_path, user_id, final_attempt=final_attempt)
+    except Exception as e:
+        if final_attempt:
+            raise
+        raise self.retry(exc=e, countdown=settings.ingestion_retry_backoff * 2 ** self.request.retries)
+
+
+def enqueue_ingestion(document_id: str, file_path: str, user_id: str):
+    """
+    Queue ingestion for a document; the document id doubles as the task id.
+    """
+    return ingest_document.apply_async(args=(document_id, file_path, user_id), task_id=document_id)
@@ -0,0 +1,188 @@
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+RSS_SAMPLE_SECONDS = 0.005
+# run parameters that change what a stage measures: results are not comparable across them
+RUN_PARAMETERS = ("sizes", "repeats", "llm_latency_ms", "quiz_users", "extraction_engine")
+# where the run happened: comparable, but expect throughput differences
+MACHINE_PARAMETERS = ("cpu_count", "platform", "python")
+
+
+def current_rss_bytes() -> int:
+    """
+    Resident set size of this process (Linux /proc; falls back to the peak).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class _RSSSampler:
+    """
+    Samples RSS in a background thread to find the peak during one stage
+    (ru_maxrss is a process-lifetime peak, so it can't be split per stage).
+    """
+
+    def __init__(self):
+        self.peak = current_rss_bytes()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(RSS_SAMPLE_SECONDS):
+            self.peak = max(self.peak, current_rss_bytes())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss_bytes())
+
+
+class Stage:
+    """
+    Collects per-operation latencies for one benchmark stage. `items` is the
+    work done (pages, chunks, requests...) for the throughput figure.
+    """
+
+    def __init__(self, name: str, unit: str, busy_only: bool = False):
+        self.name = name
+        self.unit = unit
+        self.busy_only = busy_only
+        self.latencies: List[float] = []
+        self.items = 0
+        self.elapsed = 0.0
+        self.peak_rss = 0
+
+    @contextmanager
+    def op(self, items: int = 1) -> Iterator[None]:
+        start = time.perf_counter()
+        yield
+        self.latencies.append(time.perf_counter() - start)
+        self.items += items
+
+    def result(self) -> Dict:
+        lat = np.asarray(self.latencies) * 1000.0
+        if self.busy_only:
+            # interleaved with another stage: only time spent in this stage's ops counts
+            self.elapsed = float(sum(self.latencies))
+        return {
+            "unit": self.unit,
+            "ops": len(self.latencies),
+            "items": self.items,
+            "elapsed_ms": round(self.elapsed * 1000.0, 3),
+            "throughput_per_s": round(self.items / self.elapsed, 3) if self.elapsed else None,
+            "p50_ms": round(float(np.percentile(lat, 50)), 3) if len(lat) else None,
+            "p99_ms": round(float(np.percentile(lat, 99)), 3) if len(lat) else None,
+            "peak_rss_mb": round(self.peak_rss / 2 ** 20, 1),
+        }
+
+
+class Suite:
+    def __init__(self):
+        self.stages: Dict[str, Dict] = {}
+
+    @contextmanager
+    def stage(self, name: str, unit: str, busy_only: bool = False) -> Iterator[Stage]:
+        stage = Stage(name, unit, busy_only)
+        print(f"[bench] {name} ...", file=sys.stderr, flush=True)
+        start = time.perf_counter()
+        with _RSSSampler() as rss:
+            yield stage
+        stage.elapsed = time.perf_counter() - start
+        stage.peak_rss = rss.peak
+        self.stages[name] = stage.result()
+        print(f"[bench] {name}: {self.stages[name]}", file=sys.stderr, flush=True)
+
+
+def _elapsed_ms(stage: Dict) -> Optional[float]:
+    if stage.get("elapsed_ms") is not None:
+        return stage["elapsed_ms"]
+    # results saved before elapsed_ms was recorded
+    if stage.get("items") and stage.get("throughput_per_s"):
+        return stage["items"] / stage["throughput_per_s"] * 1000.0
+    return None
+
+
+def compare(
+    current: Dict, baseline: Dict, tolerance: float, min_delta_ms: float = 1.0, min_elapsed_ms: float = 50.0
+) -> List[str]:
+    """
+    Stages present in both runs whose p50 latency grew, or throughput fell,
+    by more than `tolerance` (a fraction). p50 growth under `min_delta_ms` is
+    treated as timer noise, and throughput is only compared for stages that
+    ran for at least `min_elapsed_ms` in both runs (a few sub-millisecond
+    operations can't give a stable rate). Returns human-readable findings.
+    """
+    regressions = []
+    for name, base in baseline.get("stages", {}).items():
+        cur = current.get("stages", {}).get(name)
+        if not cur:
+            continue
+        if (base.get("p50_ms") and cur.get("p50_ms") is not None
+                and cur["p50_ms"] - base["p50_ms"] >= min_delta_ms
+                and cur["p50_ms"] > base["p50_ms"] * (1 + tolerance)):
+            regressions.append(f"{name}: p50 {cur['p50_ms']}ms vs baseline {base['p50_ms']}ms")
+        if (base.get("throughput_per_s") and cur.get("throughput_per_s") is not None
+                and min(_elapsed_ms(base) or 0.0, _elapsed_ms(cur) or 0.0) >= min_elapsed_ms
+                and cur["throughput_per_s"] < base["throughput_per_s"] * (1 - tolerance)):
+            regressions.append(
+                f"{name}: throughput {cur['throughput_per_s']}/s vs baseline {base['throughput_per_s']}/s"
+            )
+    return regressions
+
+
+def compare_meta(current: Dict, baseline: Dict) -> Tuple[List[str], List[str]]:
+    """
+    (run-parameter differences, machine differences) between two results'
+    `meta`. The first make the comparison meaningless; the second make it
+    noisy.
+    """
+    cur, base = current.get("meta", {}), baseline.get("meta", {})
+
+    def differences(keys):
+        return [
+            f"{key}: {cur.get(key)!r} vs baseline {base.get(key)!r}" for key in keys if cur.get(key) != base.get(key)
+        ]
+
+    return differences(RUN_PARAMETERS), differences(MACHINE_PARAMETERS)
+
+
+def median_stages(runs: List[Dict]) -> Dict:
+    """
+    Per-stage, per-metric median over several runs' `stages`; stages missing
+    from a run are merged from the runs that have them.
+    """
+    merged = {}
+    for name in dict.fromkeys(name for stages in runs for name in stages):
+        results = [stages[name] for stages in runs if name in stages]
+        merged[name] = {}
+        for key, value in results[0].items():
+            values = [r[key] for r in results if isinstance(r.get(key), (int, float))]
+            if isinstance(value, str) or not values:
+                merged[name][key] = value
+            else:
+                median = float(np.median(values))
+                merged[name][key] = int(round(median)) if isinstance(value, int) else round(median, 3)
+    return merged
+
+
+def load_json(path: str) -> Optional[Dict]:
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
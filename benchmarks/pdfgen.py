@@ -0,0 +1,35 @@
+import random
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+SUBJECTS = ["The cell", "Photosynthesis", "The mitochondrion", "A volcano", "The Renaissance", "Blockchain",
+            "The French Revolution", "Plate tectonics", "A neural network", "The water cycle", "Inflation"]
+VERBS = ["converts", "regulates", "produces", "depends on", "influenced", "reduces", "stores", "transports"]
+OBJECTS = ["energy", "trade routes", "genetic material", "carbon dioxide", "public opinion", "magma",
+           "hashed ledgers", "market prices", "classical art", "gradient updates", "sediment layers"]
+PAGE_RECT = fitz.Rect(40, 40, 555, 800)
+
+
+def _sentence(rng: random.Random) -> str:
+    return (f"{rng.choice(SUBJECTS)} {rng.choice(VERBS)} {rng.choice(OBJECTS)} "
+            f"in {rng.randint(2, 90)} documented cases according to section {rng.randint(1, 40)}.")
+
+
+def generate_pdf(path: Path, pages: int, seed: int = 0, sentences_per_page: int = 30) -> Path:
+    """
+    Write a deterministic text PDF with `pages` pages of factual-looking prose.
+    Existing files are reused, so repeated runs benchmark identical input.
+    """
+    path = Path(path)
+    if path.exists():
+        return path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page()
+        page.insert_textbox(PAGE_RECT, " ".join(_sentence(rng) for _ in range(sentences_per_page)), fontsize=9)
+    doc.save(str(path))
+    doc.close()
+    return path
@@ -0,0 +1,315 @@
+"""
+End-to-end pipeline benchmark with offline stand-ins.
+
+Runs extraction, chunking, embedding, vector upsert/fetch and question
+generation against generated PDFs of increasing size, then the quiz and
+question-list endpoints, using the local vector store, a throwaway SQLite
+database and the stub LLM provider. Prints (or writes) JSON with throughput,
+p50/p99 latency and peak RSS per stage.
+
+    python -m benchmarks.run --sizes 10,50,200 --output bench.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json      # exit 1 on regression
+    python -m benchmarks.run --runs 3 --save-baseline benchmarks/baseline.json
+
+Exit status 2 means the baseline was recorded with different run parameters.
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,50,200", help="comma-separated PDF page counts")
+    parser.add_argument("--repeats", type=int, default=3, help="repetitions of each per-document stage")
+    parser.add_argument("--workdir", default=".bench", help="scratch directory (PDFs are kept between runs)")
+    parser.add_argument("--llm-latency-ms", type=int, default=50, help="stub LLM latency per call")
+    parser.add_argument("--quiz-users", type=int, default=20, help="simulated users in the quiz stages")
+    parser.add_argument("--runs", type=int, default=1,
+                        help="run the suite this many times in fresh processes and report per-stage medians")
+    parser.add_argument("--output", help="write results JSON here instead of stdout")
+    parser.add_argument("--baseline", help="compare against this results JSON; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed regression as a fraction")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="ignore p50 changes smaller than this")
+    parser.add_argument("--min-elapsed-ms", type=float, default=50.0,
+                        help="only compare throughput of stages that ran at least this long")
+    parser.add_argument("--save-baseline", help="also write the results to this path as the new baseline")
+    return parser.parse_args(argv)
+
+
+def _configure_environment(args, state: Path):
+    """
+    Point every backend at offline, throwaway implementations. Must run before
+    `app` is imported, since settings are read at import time.
+    """
+    forced = {
+        "VECTOR_BACKEND": "local",
+        "LLM_PROVIDER": "stub",
+        "LLM_STUB_LATENCY_MS": str(args.llm_latency_ms),
+        "LLM_STUB_FAILURE_RATE": "0",
+        "LLM_CACHE_ENABLED": "false",
+        "DATABASE_URL": f"sqlite:///{state / 'bench.db'}",
+        "LOCAL_INDEX_PATH": str(state / "vector_index"),
+        "LEXICAL_INDEX_PATH": str(state / "lexical_index"),
+        "EMBEDDING_CACHE_PATH": str(state / "embedding_cache.sqlite3"),
+        "UPLOAD_DIR": str(state / "uploads"),
+        "CELERY_BROKER_URL": "memory://",
+        "CELERY_RESULT_BACKEND": "cache+memory://",
+        "CELERY_TASK_ALWAYS_EAGER": "true",
+    }
+    os.environ.update(forced)
+    # required settings with no default; never used by the offline backends
+    for key, value in {
+        "PINECONE_API_KEY": "bench", "PINECONE_ENVIRONMENT": "bench", "PINECONE_INDEX_NAME": "bench",
+        "PINECONE_DIMENSION": "384", "SECRET_KEY": "bench", "ALGORITHM": "HS256",
+        "ACCESS_TOKEN_EXPIRE_MINUTES": "30", "REDIS_URL": "redis://localhost:6379/0",
+    }.items():
+        os.environ.setdefault(key, value)
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _bench_document(suite, settings, pdf_path: Path, pages: int, repeats: int) -> dict:
+    from app.services import llm_client, vector_db
+    from app.services.chunk_selection import select_diverse_chunks
+    from app.services.chunking import chunk_text
+    from app.services.embeddings import get_embeddings
+    from app.services.extraction import extract_full_text
+
+    tag = f"pages={pages}"
+
+    with suite.stage(f"extract[{tag}]", "pages") as stage:
+        for _ in range(repeats):
+            with stage.op(pages):
+                text = extract_full_text(str(pdf_path))
+
+    with suite.stage(f"chunk[{tag}]", "chunks") as stage:
+        for _ in range(repeats):
+            chunks = []
+            with stage.op(0):
+                chunks = list(chunk_text(text, chunk_size=settings.chunk_size, overlap=settings.chunk_overlap))
+            stage.items += len(chunks)
+
+    batch_size = settings.ingest_embed_batch_size
+    batches = [chunks[i:i + batch_size] for i in range(0, len(chunks), batch_size)]
+    embeddings = []
+    for label in ("embed_cold", "embed_warm"):
+        with suite.stage(f"{label}[{tag}]", "chunks") as stage:
+            embeddings = []
+            for batch in batches:
+                with stage.op(len(batch)):
+                    embeddings.extend(get_embeddings(batch))
+
+    document_id = str(uuid.uuid4())
+    chunk_ids = [f"{document_id}_c{i}" for i in range(len(chunks))]
+    vectors = [
+        {"id": cid, "values": emb,
+         "metadata": {"document_id": document_id, "chunk_id": cid, "text_excerpt": text_[:400]}}
+        for cid, emb, text_ in zip(chunk_ids, embeddings, chunks)
+    ]
+    with suite.stage(f"upsert[{tag}]", "chunks") as stage:
+        step = settings.ingest_upsert_batch_size
+        for i in range(0, len(vectors), step):
+            with stage.op(len(vectors[i:i + step])):
+                vector_db.upsert_chunks(vectors[i:i + step])
+        with stage.op(0):
+            vector_db.flush()
+
+    with suite.stage(f"fetch[{tag}]", "chunks") as stage:
+        for _ in range(repeats):
+            with stage.op(len(chunk_ids)):
+                fetched = vector_db.fetch_chunks_for_document(
+                    document_id, top_k=None, chunk_ids=chunk_ids, include_values=True
+                )
+
+    context = [c["text"] for c in select_diverse_chunks(fetched, settings.generation_chunk_count)]
+    questions = []
+    with suite.stage(f"generate[{tag}]", "questions") as stage:
+        for _ in range(repeats):
+            with stage.op(0):
+                questions = llm_client.generate_questions(context, n_mcq=10, n_short=5, use_cache=False)
+            stage.items += len(questions)
+
+    return {"document_id": document_id, "questions": questions}
+
+
+def _bench_quiz(suite, document_id: str, questions: list, users: int):
+    from fastapi.testclient import TestClient
+
+    from app.db.session import SessionLocal
+    from app.main import app
+    from app.models.document import Document
+    from app.models.user import User
+    from app.services.question_writer import bulk_insert_questions
+
+    with TestClient(app) as client:
+        db = SessionLocal()
+        try:
+            owner = "bench-owner"
+            db.add(User(id=owner, email=f"{owner}@bench.local"))
+            db.add(Document(id=document_id, user_id=owner, filename="bench.pdf", file_path="-", status="indexed"))
+            for u in range(users):
+                db.add(User(id=f"bench-user-{u}", email=f"user{u}@bench.local"))
+            db.commit()
+            saved, _ = bulk_insert_questions(db, document_id, questions)
+        finally:
+            db.close()
+
+        def answer_for(q):
+            return {"selected_index": 0} if q["type"] == "mcq" else {"text": q["answer"] or ""}
+
+        with suite.stage("questions_list", "requests") as stage:
+            for _ in range(users):
+                with stage.op():
+                    client.get(f"/questions/{document_id}").raise_for_status()
+
+        with suite.stage("quiz_next", "requests", busy_only=True) as next_stage, \
+                suite.stage("quiz_answer", "requests", busy_only=True) as answer_stage:
+            # timed separately, but interleaved the way a client walks a quiz
+            for u in range(users):
+                user_id = f"bench-user-{u}"
+                while True:
+                    with next_stage.op():
+                        q = client.get("/quiz/next", params={"user_id": user_id, "document_id": document_id}).json()
+                    if "id" not in q:
+                        break
+                    with answer_stage.op():
+                        client.post("/quiz/answer", json={
+                            "user_id": user_id, "document_id": document_id,
+                            "question_id": q["id"], "answer": answer_for(q),
+                        }).raise_for_status()
+
+        with suite.stage("quiz_answers_batch", "answers") as stage:
+            payload_answers = [{"question_id": q["id"], "answer": answer_for(q)} for q in saved]
+            for u in range(users):
+                with stage.op(len(payload_answers)):
+                    client.post("/quiz/answers", json={
+                        "user_id": f"bench-user-{u}", "document_id": document_id, "answers": payload_answers,
+                    }).raise_for_status()
+
+
+def _run_once(args) -> dict:
+    workdir = Path(args.workdir).resolve()
+    state = workdir / "state"
+    shutil.rmtree(state, ignore_errors=True)
+    state.mkdir(parents=True)
+    _configure_environment(args, state)
+
+    from benchmarks.harness import Suite
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    suite = Suite()
+
+    # the app (and PyMuPDF) print and log debug output freely: keep it off
+    # stdout, which carries the JSON, and skip log formatting, which is not
+    # what is being measured
+    logging.disable(logging.INFO)
+    with contextlib.redirect_stdout(sys.stderr):
+        from benchmarks.pdfgen import generate_pdf
+        from app.config.settings import settings
+        from app.db.session import Base, engine
+        from app.models import attempt, document, progress, question, user  # noqa: F401  (register tables)
+
+        Base.metadata.create_all(bind=engine)
+        last = None
+        for pages in sizes:
+            pdf_path = generate_pdf(workdir / "pdfs" / f"bench-{pages}p.pdf", pages, seed=pages)
+            last = _bench_document(suite, settings, pdf_path, pages, args.repeats)
+        if last:
+            _bench_quiz(suite, last["document_id"], last["questions"], args.quiz_users)
+
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "sizes": sizes,
+            "repeats": args.repeats,
+            "llm_latency_ms": args.llm_latency_ms,
+            "quiz_users": args.quiz_users,
+            "runs": 1,
+            "extraction_engine": settings.extraction_engine,
+        },
+        "stages": suite.stages,
+    }
+
+
+def _run_repeated(args) -> dict:
+    """
+    `args.runs` whole-suite runs, each in a fresh process (the app's settings,
+    engine and caches are per process), merged into per-stage medians.
+    """
+    from benchmarks.harness import median_stages
+
+    child_args = [
+        "--sizes", args.sizes, "--repeats", str(args.repeats), "--workdir", str(Path(args.workdir).resolve()),
+        "--llm-latency-ms", str(args.llm_latency_ms), "--quiz-users", str(args.quiz_users),
+    ]
+    runs = []
+    for i in range(args.runs):
+        print(f"[bench] run {i + 1}/{args.runs}", file=sys.stderr, flush=True)
+        child = subprocess.run([sys.executable, "-m", "benchmarks.run", *child_args], stdout=subprocess.PIPE,
+                               text=True, check=True, cwd=Path(__file__).resolve().parent.parent)
+        runs.append(json.loads(child.stdout))
+    return {
+        "meta": {**runs[0]["meta"], "runs": args.runs},
+        "stages": median_stages([run["stages"] for run in runs]),
+    }
+
+
+def main(argv=None) -> int:
+    args = _parse_args(argv)
+    results = _run_repeated(args) if args.runs > 1 else _run_once(args)
+
+    from benchmarks.harness import compare, compare_meta, load_json
+
+    encoded = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(encoded + "\n", encoding="utf-8")
+    else:
+        print(encoded)
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(encoded + "\n", encoding="utf-8")
+
+    if args.baseline:
+        baseline = load_json(args.baseline)
+        if baseline is None:
+            print(f"[bench] baseline {args.baseline} not found", file=sys.stderr)
+            return 2
+        parameters, machine = compare_meta(results, baseline)
+        if parameters:
+            for line in parameters:
+                print(f"[bench] run parameters differ from the baseline: {line}", file=sys.stderr)
+            print("[bench] not comparing; rerun with the baseline's parameters or save a new baseline",
+                  file=sys.stderr)
+            return 2
+        for line in machine:
+            print(f"[bench] WARNING baseline was recorded elsewhere: {line}", file=sys.stderr)
+        regressions = compare(results, baseline, args.tolerance, args.min_delta_ms, args.min_elapsed_ms)
+        for line in regressions:
+            print(f"[bench] REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"[bench] no regressions beyond {args.tolerance:.0%} against {args.baseline}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
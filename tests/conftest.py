@@ -0,0 +1,43 @@
+import os
+import tempfile
+
+# settings are read at import time; point everything at a throwaway directory
+# and the offline backends before any `app` module is imported
+_TMP = tempfile.mkdtemp(prefix="ragquiz-tests-")
+for _key, _value in {
+    "DATABASE_URL": f"sqlite:///{os.path.join(_TMP, 'quiz.db')}",
+    "VECTOR_BACKEND": "local",
+    "LOCAL_INDEX_PATH": os.path.join(_TMP, "vector_index"),
+    "LEXICAL_INDEX_PATH": os.path.join(_TMP, "lexical_index"),
+    "UPLOAD_DIR": os.path.join(_TMP, "uploads"),
+    "EMBEDDING_CACHE_PATH": os.path.join(_TMP, "embedding_cache.sqlite3"),
+    "LLM_CACHE_PATH": os.path.join(_TMP, "llm_cache.sqlite3"),
+    "LLM_PROVIDER": "stub",
+    "PINECONE_API_KEY": "test",
+    "PINECONE_ENVIRONMENT": "test",
+    "PINECONE_INDEX_NAME": "test",
+    "PINECONE_DIMENSION": "384",
+    "SECRET_KEY": "test",
+    "ALGORITHM": "HS256",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "30",
+    "REDIS_URL": "redis://localhost:6379/0",
+    "CELERY_BROKER_URL": "memory://",
+    "CELERY_RESULT_BACKEND": "cache+memory://",
+}.items():
+    os.environ.setdefault(_key, _value)
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def db():
+    from app.db.session import Base, SessionLocal, engine
+    from app.models import attempt, document, progress, question, user  # noqa: F401  registers the tables
+
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=engine)
@@ -0,0 +1,14 @@
+import numpy as np
+
+from app.services import embeddings
+from app.services.embedding_cache import EmbeddingCache
+
+
+def test_cache_miss_and_hit_return_the_same_vector(tmp_path, monkeypatch):
+    monkeypatch.setattr(embeddings, "_cache", EmbeddingCache(str(tmp_path / "cache.sqlite3"), dtype="float16"))
+    texts = ["the mitochondria is the powerhouse of the cell", "entropy never decreases"]
+
+    miss = embeddings.get_embeddings(texts)
+    hit = embeddings.get_embeddings(texts)
+
+    assert np.array_equal(np.asarray(miss), np.asarray(hit))
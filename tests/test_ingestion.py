@@ -0,0 +1,20 @@
+import pytest
+
+from app.models.document import Document
+from app.models.user import User
+from app.tasks.ingestion import start_ingestion_for_document
+
+
+@pytest.mark.parametrize("final_attempt, status", [(False, "retrying"), (True, "failed")])
+def test_failed_attempt_is_terminal_only_when_final(db, tmp_path, final_attempt, status):
+    db.add(User(id="u1", email="u1@example.com"))
+    db.add(Document(id="doc", user_id="u1", filename="a.pdf", file_path="a.pdf", status="queued"))
+    db.commit()
+
+    with pytest.raises(Exception):
+        start_ingestion_for_document("doc", str(tmp_path / "missing.pdf"), "u1", final_attempt=final_attempt)
+
+    db.expire_all()
+    doc = db.get(Document, "doc")
+    assert doc.status == status
+    assert doc.ingestion_error
@@ -0,0 +1,27 @@
+from app.services.json_stream import parse_json_objects
+from app.services.llm_client import validate_questions
+
+# an interrupted stream: a good MCQ, objects without "question" or with null
+# fields, a truncated one, then a good short answer
+SALVAGED = """[
+  {"type": "mcq", "question": "Which is prime?", "options": ["4", "6", "7", "9"], "answer": "7"},
+  {"type": null, "question": "Untyped?", "answer": "x"},
+  {"type": "short", "answer": "no question text"},
+  {"type": "mcq", "question": null, "options": ["a", "b"]},
+  {"type": "mcq", "question": "Bad options?", "options": null, "answer": "a"},
+  {"type": "short", "question": "Define entropy.", "answer": "Disorder"},
+  {"type": "mcq", "question": "Cut off", "options": ["a", "b"
+"""
+
+
+def test_malformed_salvaged_objects_are_skipped():
+    parsed = parse_json_objects(SALVAGED)
+    assert len(parsed) == 6
+
+    validated = validate_questions(parsed, n_mcq=3, n_short=3)
+
+    assert [(q["type"], q["question"]) for q in validated] == [
+        ("mcq", "Which is prime?"),
+        ("short", "Define entropy."),
+    ]
+    assert validated[0]["options"][2] == "C) 7"
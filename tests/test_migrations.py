@@ -0,0 +1,32 @@
+import uuid
+
+from app.db.migrations import upgrade_schema
+from app.db.session import engine
+from app.models.attempt import QuestionAttempt
+from app.models.document import Document
+from app.models.progress import UserProgress
+from app.models.user import User
+from app.services.question_writer import bulk_insert_questions
+
+
+def test_alias_progress_is_folded_into_the_canonical_document(db):
+    db.add(User(id="u1", email="u1@example.com"))
+    db.add(Document(id="orig", user_id="u1", filename="a.pdf", file_path="a.pdf", status="indexed"))
+    db.add(Document(id="alias", user_id="u1", filename="b.pdf", file_path="a.pdf", status="indexed",
+                    source_document_id="orig"))
+    db.commit()
+    saved, _ = bulk_insert_questions(db, "orig", [{"type": "short", "question": f"Q{i}?", "answer": "a"} for i in range(3)])
+    # the split left by the old keying: the alias row took the +2, the original the -1
+    db.add_all([
+        QuestionAttempt(id=uuid.uuid4(), user_id="u1", document_id="orig", question_id=uuid.UUID(saved[0]["id"]), correct=True),
+        QuestionAttempt(id=uuid.uuid4(), user_id="u1", document_id="orig", question_id=uuid.UUID(saved[1]["id"]), correct=False),
+        UserProgress(user_id="u1", document_id="alias", score=2),
+        UserProgress(user_id="u1", document_id="orig", score=-1),
+    ])
+    db.commit()
+
+    upgrade_schema(engine)
+    upgrade_schema(engine)
+
+    db.expire_all()
+    assert [(p.document_id, p.score) for p in db.query(UserProgress).all()] == [("orig", 1)]
@@ -0,0 +1,37 @@
+from app.models.document import Document
+from app.models.progress import UserProgress
+from app.models.user import User
+from app.services.question_writer import bulk_insert_questions
+from app.services.quiz_service import get_next_question_for_user, grade_answers_and_update_progress
+
+
+def _seed(db):
+    db.add(User(id="u1", email="u1@example.com"))
+    db.add(Document(id="orig", user_id="u1", filename="a.pdf", file_path="a.pdf", status="indexed"))
+    db.add(Document(id="alias", user_id="u1", filename="b.pdf", file_path="a.pdf", status="indexed",
+                    source_document_id="orig"))
+    db.commit()
+    saved, _ = bulk_insert_questions(
+        db, "orig", [{"type": "short", "question": f"Q{i}?", "answer": f"a{i}"} for i in range(3)]
+    )
+    return [q["id"] for q in saved]
+
+
+def test_alias_and_original_share_progress(db):
+    q0, q1, _ = _seed(db)
+
+    via_alias = grade_answers_and_update_progress(db, "u1", "alias", [{"question_id": q0, "answer": {"text": "a0"}}])
+    assert via_alias["current_score"] == 1
+
+    # re-answering the same question wrong through the original replaces the attempt
+    via_original = grade_answers_and_update_progress(
+        db, "u1", "orig", [{"question_id": q0, "answer": {"text": "nope"}}, {"question_id": q1, "answer": {"text": "a1"}}]
+    )
+    assert via_original["current_score"] == 1
+
+    rows = db.query(UserProgress).filter_by(user_id="u1").all()
+    assert [(r.document_id, r.score) for r in rows] == [("orig", 1)]
+
+    # both IDs walk the same quiz: the two answered questions are skipped
+    assert get_next_question_for_user(db, "u1", "alias")["question_text"] == "Q2?"
+    assert get_next_question_for_user(db, "u1", "orig")["question_text"] == "Q2?"
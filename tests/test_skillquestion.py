@@ -0,0 +1,40 @@
+import math
+
+from app.api.skillquestion import SECTION_OVERSAMPLE, merge_questions
+from app.services.llm_client import split_quota
+
+
+def _partials(n_sections: int, n_mcq: int, n_short: int):
+    # each section answers with exactly its oversampled quota
+    mcq_quota = split_quota(math.ceil(n_mcq * SECTION_OVERSAMPLE), [1] * n_sections)
+    short_quota = split_quota(math.ceil(n_short * SECTION_OVERSAMPLE), [1] * n_sections)
+    return [
+        [{"type": "mcq", "question": f"Section {i} mcq {j}?", "options": ["a", "b"], "answer": "a"} for j in range(m)]
+        + [{"type": "short", "question": f"Section {i} short {j}?", "answer": "x"} for j in range(s)]
+        for i, (m, s) in enumerate(zip(mcq_quota, short_quota))
+    ]
+
+
+def _sections(questions):
+    return [int(q["question"].split()[1]) for q in questions]
+
+
+def test_merge_keeps_the_end_of_the_document():
+    merged = merge_questions(_partials(20, 10, 6), 10, 6)
+
+    mcqs = [q for q in merged if q["type"] == "mcq"]
+    shorts = [q for q in merged if q["type"] == "short"]
+    assert len(mcqs) == 10 and len(shorts) == 6
+    assert max(_sections(mcqs)) == 19
+    assert max(_sections(shorts)) >= 16
+    assert _sections(mcqs) == sorted(_sections(mcqs))
+
+
+def test_merge_drops_duplicates_and_fills_from_other_sections():
+    partials = [
+        [{"type": "mcq", "question": "Same?", "options": ["a", "b"]}, {"type": "mcq", "question": "A2?", "options": ["a"]}],
+        [{"type": "mcq", "question": "same ?", "options": ["a", "b"]}],
+        [{"type": "mcq", "question": "C1?", "options": ["a", "b"]}],
+    ]
+    merged = merge_questions(partials, 3, 0)
+    assert [q["question"] for q in merged] == ["Same?", "A2?", "C1?"]